@@ -0,0 +1,59 @@
+import pytest
+from valinvest.fundamentals import Fundamental
+from valinvest.providers import BulkFileProvider
+from valinvest import cache
+from valinvest.cache import ScoreCache
+from .test_providers import write_bulk_file
+
+
+@pytest.fixture
+def provider(tmp_path):
+    path, profile_path = write_bulk_file(tmp_path / 'bulk.csv')
+    return BulkFileProvider(path, profile_path)
+
+
+class TestScoreCache:
+
+    def test_cached_scores(self, provider, tmp_path, monkeypatch):
+        path = str(tmp_path / 'scores.sqlite')
+        aaa = Fundamental('AAA', provider=provider, cache=ScoreCache(path))
+        fscore = aaa.fscore()
+        roic_score = aaa.roic_score(years=5)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("score should come from the cache")
+
+        monkeypatch.setattr(Fundamental, '_score', fail)
+
+        # Another cache instance on the same file, as another process would do
+        aaa = Fundamental('AAA', provider=provider, cache=ScoreCache(path))
+        assert aaa.fscore() == fscore
+        assert aaa.fscore(10) == fscore
+        assert aaa.roic_score(5) == roic_score
+
+        with pytest.raises(AssertionError):
+            aaa.roic_score(3)
+
+    def test_key_depends_on_scoring_version(self, monkeypatch):
+        key = ScoreCache.key('fingerprint', 'fscore', years=10)
+        monkeypatch.setattr(cache, 'SCORING_VERSION', cache.SCORING_VERSION + 1)
+        assert ScoreCache.key('fingerprint', 'fscore', years=10) != key
+
+    def test_key_depends_on_statements(self, provider, tmp_path):
+        cache = ScoreCache(str(tmp_path / 'scores.sqlite'))
+        aaa = Fundamental('AAA', provider=provider, cache=cache)
+        bbb = Fundamental('BBB', provider=provider, cache=cache)
+        assert aaa.fingerprint != bbb.fingerprint
+        assert aaa.ebitda_cover_score() == 1
+        assert bbb.beta_score() == 0
+
+    def test_wrong_cache(self, provider):
+        with pytest.raises(TypeError):
+            Fundamental('AAA', provider=provider, cache='scores.sqlite')
+
+    def test_shared_with_lazy_mode(self, provider, tmp_path, monkeypatch):
+        cache = ScoreCache(str(tmp_path / 'scores.sqlite'))
+        revenue_score = Fundamental('AAA', provider=provider, cache=cache).revenue_score()
+
+        monkeypatch.setattr(Fundamental, '_score', lambda *args: 1 / 0)
+        assert Fundamental('AAA', provider=provider, cache=cache, lazy=True).revenue_score() == revenue_score
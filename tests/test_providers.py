@@ -0,0 +1,348 @@
+import json
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from valinvest import providers, fundamentals
+from valinvest.fundamentals import Fundamental
+from valinvest.providers import BulkFileProvider, HttpProvider, StatementProvider
+
+YEARS = range(2009, 2020)
+
+
+def write_bulk_file(path, tickers=('AAA', 'BBB')):
+    rows = []
+    for i, ticker in enumerate(tickers):
+        for n, year in enumerate(YEARS):
+            date = '{}-12-31'.format(year)
+            rows.append({
+                'ticker': ticker, 'statement': 'income-statement', 'date': date,
+                'Revenue': 100 + 10 * n, 'EBITDA': 30 + (n % 2), 'EPS Diluted': 1 + n,
+                'Operating Income': 25, 'Operating Expenses': 5,
+                'Income Tax Expense': 5, 'Earnings before Tax': 20, 'Net Income': 15,
+                'Weighted Average Shs Out (Dil)': 100 - n, 'Interest Expense': 2 + i,
+            })
+            rows.append({
+                'ticker': ticker, 'statement': 'balance-sheet-statement', 'date': date,
+                'Total debt': 40, 'Total shareholders equity': 60,
+            })
+            rows.append({
+                'ticker': ticker, 'statement': 'cash-flow-statement', 'date': date,
+                'Free Cash Flow': 20,
+            })
+    pd.DataFrame(rows).to_csv(path, index=False)
+    pd.DataFrame({'ticker': list(tickers), 'beta': [0.8 if i % 2 == 0 else '' for i in range(len(tickers))]}).to_csv(
+        str(path) + '.profile.csv', index=False)
+    return str(path), str(path) + '.profile.csv'
+
+
+@pytest.fixture
+def provider(tmp_path):
+    path, profile_path = write_bulk_file(tmp_path / 'bulk.csv')
+    return BulkFileProvider(path, profile_path)
+
+
+def test_incomplete_provider():
+    class BetaOnlyProvider(StatementProvider):
+
+        def get_beta(self, ticker):
+            return 1.0
+
+    with pytest.raises(TypeError):
+        BetaOnlyProvider()
+
+
+class TestBulkFileProvider:
+
+    def test_statement_shape(self, provider):
+        income = provider.get_financial_statement('AAA', 'income-statement')
+        assert list(income.columns) == [
+            'ticker', 'statement', 'header', 'year', 'amount']
+        assert set(income['header']) >= {'revenue', 'ebitda', 'eps_diluted'}
+        assert 'total_debt' not in set(income['header'])
+
+    def test_text_columns(self, tmp_path):
+        path, profile_path = write_bulk_file(tmp_path / 'bulk.csv')
+        rows = pd.read_csv(path)
+        rows['reportedCurrency'] = 'USD'
+        rows['link'] = 'https://www.sec.gov/'
+        rows.to_csv(path, index=False)
+
+        income = BulkFileProvider(path, profile_path).get_financial_statement('AAA', 'income-statement')
+        assert not {'reportedcurrency', 'link'} & set(income['header'])
+        assert set(income['header']) >= {'revenue', 'ebitda', 'eps_diluted'}
+
+    def test_beta(self, provider):
+        assert provider.get_beta('AAA') == pytest.approx(0.8)
+        assert provider.get_beta('BBB') == float('inf')
+
+    def test_unknown_ticker(self, provider):
+        with pytest.raises(ValueError):
+            Fundamental('AAPL', provider=provider)
+
+    def test_wrong_provider(self):
+        with pytest.raises(TypeError):
+            Fundamental('AAPL', provider='tt')
+
+    def test_fscore(self, provider):
+        aaa = Fundamental('aaa', provider=provider)
+        assert aaa.revenue_score() == 1
+        assert aaa.eq_buyback_score() == 1
+        assert aaa.croic_score() == 1
+        assert aaa.beta_score() == 1
+        assert aaa.fscore() == round(
+            aaa.ebitda_score() + aaa.revenue_score() + aaa.eps_score() + 1 +
+            aaa.ebitda_cover_score() + aaa.debt_cost_score() + 1 +
+            aaa.roic_score() + 1, 2)
+
+
+class TestQuarterlyStatements:
+
+    @pytest.fixture
+    def provider(self, tmp_path):
+        rows = []
+        for n, date in enumerate(pd.date_range('2016-03-31', periods=16, freq='QE')):
+            rows.append({'ticker': 'QQQ', 'statement': 'income-statement', 'period': 'quarter',
+                         'date': date.strftime('%Y-%m-%d'), 'Revenue': 10 + n,
+                         'Weighted Average Shs Out (Dil)': 100})
+            rows.append({'ticker': 'QQQ', 'statement': 'balance-sheet-statement', 'period': 'quarter',
+                         'date': date.strftime('%Y-%m-%d'), 'Total debt': n})
+        path = tmp_path / 'quarters.csv'
+        pd.DataFrame(rows).to_csv(path, index=False)
+        return BulkFileProvider(str(path))
+
+    def test_trailing_twelve_months(self, provider):
+        income = provider.get_financial_statement('QQQ', 'income-statement', 'quarter')
+        revenue = income[income['header'] == 'revenue'].set_index('year')['amount']
+        # Latest quarter is 2019Q4, TTM points every four quarters back
+        assert revenue.dropna().to_dict() == {2016: 10 + 11 + 12 + 13,
+                                              2017: 14 + 15 + 16 + 17,
+                                              2018: 18 + 19 + 20 + 21,
+                                              2019: 22 + 23 + 24 + 25}
+        shares = income[income['header'] == 'weighted_average_shs_out_(dil)']
+        assert set(shares['amount']) == {100}
+
+        balance = provider.get_financial_statement('QQQ', 'balance-sheet-statement', 'quarter')
+        debt = balance.set_index('year')['amount'].dropna()
+        assert debt.to_dict() == {2016: 3, 2017: 7, 2018: 11, 2019: 15}
+
+    def test_latest_quarter_per_ticker(self, tmp_path):
+        rows = []
+        for ticker, periods in [('AAA', 16), ('BBB', 14)]:
+            for n, date in enumerate(pd.date_range('2016-03-31', periods=periods, freq='QE')):
+                rows.append({'ticker': ticker, 'statement': 'income-statement', 'period': 'quarter',
+                             'date': date.strftime('%Y-%m-%d'), 'Revenue': 10 + n})
+        path = tmp_path / 'quarters.csv'
+        pd.DataFrame(rows).to_csv(path, index=False)
+        provider = BulkFileProvider(str(path))
+
+        income = provider.get_financial_statement('BBB', 'income-statement', 'quarter')
+        revenue = income.set_index('year')['amount'].dropna()
+        # Latest quarter of BBB is 2019Q2, whatever the latest quarter of AAA
+        assert revenue.to_dict() == {2017: 12 + 13 + 14 + 15,
+                                     2018: 16 + 17 + 18 + 19,
+                                     2019: 20 + 21 + 22 + 23}
+
+    def test_fiscal_quarters(self):
+        # Apple 52/53-week fiscal quarters, newest first as returned by the API
+        dates = ['2023-09-30', '2023-07-01', '2023-04-01', '2022-12-31',
+                 '2022-09-24', '2022-06-25', '2022-03-26', '2021-12-25',
+                 '2021-09-25', '2021-06-26', '2021-03-27', '2020-12-26']
+        res = {'financials': [{'date': date, 'Revenue': '1'} for date in dates]}
+        income = providers._parse_financials(res, 'AAPL', 'income-statement', 'quarter')
+        revenue = income.set_index('year')['amount'].dropna()
+        assert revenue.to_dict() == {2021: 4, 2022: 4, 2023: 4}
+
+    def test_annual_rows_missing(self, provider):
+        assert provider.get_financial_statement('QQQ', 'income-statement').empty
+
+    def test_wrong_period(self, provider):
+        with pytest.raises(ValueError):
+            Fundamental('QQQ', provider=provider, period='month')
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.content = b'' if body is None else json.dumps(body).encode()
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeSession:
+    """Financial Modeling Prep API answering 304 Not Modified to requests with a matching ETag."""
+
+    def __init__(self, etag=True):
+        self.etag = etag
+        self.requests = []
+
+    def get(self, url, headers=None):
+        self.requests.append(headers)
+        if 'profile' in url:
+            body = {'profile': {'beta': '0.9'}}
+        else:
+            body = {'financials': [{'date': '{}-09-28'.format(year), 'Revenue': str(year), 'EBITDA': ''}
+                                   for year in YEARS]}
+        etag = '"{}"'.format(hash(json.dumps(body)))
+        if self.etag and headers.get('If-None-Match') == etag:
+            return FakeResponse(304)
+        return FakeResponse(200, body, {'ETag': etag} if self.etag else {})
+
+
+class TestHttpProvider:
+
+    @pytest.mark.parametrize('etag', [True, False])
+    def test_revalidation(self, monkeypatch, etag):
+        session = FakeSession(etag)
+        monkeypatch.setattr(providers.requests, 'Session', lambda: session)
+        provider = HttpProvider('key')
+
+        aapl = Fundamental('AAPL', provider=provider)
+        assert all(headers == {} for headers in provider.session.requests)
+        assert aapl.beta == pytest.approx(0.9)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("unchanged statements should not be parsed again")
+
+        monkeypatch.setattr(providers, '_stack_statements', fail)
+        monkeypatch.setattr(pd, 'merge', fail)
+
+        provider.session.requests = []
+        assert Fundamental('AAPL', provider=provider).statements.equals(aapl.statements)
+        assert len(provider.session.requests) == 4
+        assert all(('If-None-Match' in headers) == etag for headers in provider.session.requests)
+
+
+    def test_default_provider(self, monkeypatch):
+        session = FakeSession()
+        monkeypatch.setattr(providers.requests, 'Session', lambda: session)
+        monkeypatch.setattr(providers, '_default_providers', {})
+
+        aapl = Fundamental('AAPL', 'key')
+        assert Fundamental('MSFT', 'key').provider is aapl.provider
+        assert Fundamental('MSFT', 'other key').provider is not aapl.provider
+
+        def fail(*args, **kwargs):
+            raise AssertionError("unchanged statements should not be parsed again")
+
+        monkeypatch.setattr(providers, '_stack_statements', fail)
+        session.requests = []
+        assert Fundamental('AAPL', 'key').statements.equals(aapl.statements)
+        assert all('If-None-Match' in headers for headers in session.requests)
+
+    def test_session_per_thread(self, monkeypatch):
+        sessions = []
+
+        def session():
+            sessions.append(FakeSession())
+            return sessions[-1]
+
+        monkeypatch.setattr(providers.requests, 'Session', session)
+        provider = HttpProvider('key')
+        with ThreadPoolExecutor(4) as executor:
+            betas = list(executor.map(provider.get_beta, ['AAPL'] * 4 + ['MSFT'] * 4))
+        assert betas == [pytest.approx(0.9)] * 8
+        assert 1 <= len(sessions) <= 4
+        assert sum(len(session.requests) for session in sessions) == 8
+
+    def test_tickers(self):
+        assert HttpProvider('key').has_ticker('FP')
+        assert not HttpProvider('key', tickers=['aapl']).has_ticker('FP')
+        assert HttpProvider('key', tickers=['aapl']).has_ticker('AAPL')
+        # The default provider of Fundamental serves the SP500 and NASDAQ100 tickers
+        with pytest.raises(ValueError):
+            Fundamental('FP', 'key')
+
+
+class CountingProvider(BulkFileProvider):
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.calls = []
+
+    def get_financial_statement(self, ticker, statement, period='annual'):
+        self.calls.append(statement)
+        return super().get_financial_statement(ticker, statement, period)
+
+    def get_beta(self, ticker):
+        self.calls.append('beta')
+        return super().get_beta(ticker)
+
+
+class TestLazyLoading:
+
+    @pytest.fixture
+    def provider(self, tmp_path):
+        return CountingProvider(*write_bulk_file(tmp_path / 'bulk.csv'))
+
+    def test_single_statement(self, provider):
+        aaa = Fundamental('AAA', provider=provider, lazy=True)
+        assert provider.calls == []
+
+        aaa.revenue_score()
+        aaa.eps_score()
+        assert provider.calls == ['income-statement']
+
+        aaa.roic_score()
+        assert provider.calls == ['income-statement', 'balance-sheet-statement']
+
+    def test_same_scores(self, provider):
+        lazy = Fundamental('AAA', provider=provider, lazy=True)
+        revenue_score = lazy.revenue_score()
+        fscore = lazy.fscore()
+        assert sorted(provider.calls) == sorted(
+            ['income-statement', 'balance-sheet-statement', 'cash-flow-statement', 'beta'])
+
+        eager = Fundamental('AAA', provider=provider)
+        assert eager.revenue_score() == revenue_score
+        assert eager.fscore() == fscore
+        assert eager.statements.equals(lazy.statements)
+
+    def test_same_scores_different_last_years(self, tmp_path):
+        path, profile_path = write_bulk_file(tmp_path / 'bulk.csv')
+        rows = pd.read_csv(path)
+        rows = pd.concat([rows, pd.DataFrame([{'ticker': 'AAA', 'statement': 'balance-sheet-statement',
+                                               'date': '2020-12-31', 'Total debt': 40,
+                                               'Total shareholders equity': 60}])])
+        rows.to_csv(path, index=False)
+        provider = BulkFileProvider(path, profile_path)
+
+        lazy = Fundamental('AAA', provider=provider, lazy=True)
+        revenue_score = lazy.revenue_score()
+        roic_score = lazy.roic_score()
+        # Scores do not depend on the statements loaded before
+        assert lazy.revenue_score() == revenue_score
+
+        eager = Fundamental('AAA', provider=provider)
+        assert eager.revenue_score() == revenue_score
+        assert eager.roic_score() == roic_score
+        assert Fundamental('AAA', provider=provider, lazy=True).roic_score() == roic_score
+
+    def test_densified_once(self, provider, monkeypatch):
+        densified = []
+
+        def densify(statement, years):
+            densified.append(statement['statement'].iloc[0])
+            return _densify(statement, years)
+
+        _densify = fundamentals._densify
+        monkeypatch.setattr(fundamentals, '_densify', densify)
+
+        lazy = Fundamental('AAA', provider=provider, lazy=True)
+        lazy.revenue_score()
+        lazy.roic_score()
+        lazy.fscore()
+        assert densified == ['income-statement', 'balance-sheet-statement', 'cash-flow-statement']
+
+    def test_header_of_another_statement(self, tmp_path):
+        path, profile_path = write_bulk_file(tmp_path / 'bulk.csv')
+        rows = pd.read_csv(path)
+        balance = rows['statement'] == 'balance-sheet-statement'
+        rows.loc[balance, 'Revenue'] = 1000 - rows.loc[balance, 'date'].str[:4].astype(int)
+        rows.to_csv(path, index=False)
+
+        aaa = Fundamental('AAA', provider=BulkFileProvider(path, profile_path))
+        assert aaa.revenue_score() == 1
@@ -0,0 +1,82 @@
+import json
+import time
+import threading
+import urllib.request
+import urllib.error
+import pytest
+from valinvest.providers import BulkFileProvider
+from valinvest.server import ScoringService, make_server
+from .test_providers import write_bulk_file
+
+TICKERS = ('AAA', 'BBB', 'CCC')
+
+
+@pytest.fixture
+def service(tmp_path):
+    path, profile_path = write_bulk_file(tmp_path / 'bulk.csv', TICKERS)
+    service = ScoringService(TICKERS + ('ZZZ',), provider=BulkFileProvider(path, profile_path))
+    service.load()
+    return service
+
+
+@pytest.fixture
+def url(service):
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://{}:{}'.format(*server.server_address[:2])
+    server.shutdown()
+    server.server_close()
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url) as res:
+            return res.status, json.loads(res.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+class TestScoringService:
+
+    def test_scores(self, service):
+        # Failed tickers are retried after max_age only
+        assert service.stale() == []
+        assert 'ZZZ' in service.errors
+        assert service.score('aaa') == service.scores('AAA')['fscore']
+        assert service.score('AAA', 'roic_score', years=5) == 1
+
+    def test_top(self, service):
+        top = service.top(2)
+        assert len(top) == 2
+        assert top[0][1] >= top[1][1]
+
+    def test_failed_retry(self, service, monkeypatch):
+        failed = service.errors['ZZZ'][0]
+        monkeypatch.setattr(time, 'time', lambda: failed + service.max_age + 1)
+        assert 'ZZZ' in service.stale()
+
+    def test_refresh(self, service):
+        service.max_age = 0
+        assert sorted(service.stale()) == sorted(TICKERS + ('ZZZ',))
+        assert service.load(service.stale()) == len(TICKERS)
+
+
+class TestHttpServer:
+
+    def test_queries(self, service, url):
+        status, body = get(url + '/scores/aaa')
+        assert status == 200
+        assert body['scores'] == service.scores('AAA')
+
+        status, body = get(url + '/scores/AAA/beta_score')
+        assert status == 200 and body['value'] == 1
+
+        status, body = get(url + '/top?k=2&score=revenue_score')
+        assert status == 200 and len(body['top']) == 2
+
+    def test_errors(self, url):
+        assert get(url + '/scores/ZZZ')[0] == 404
+        assert get(url + '/scores/AAA/unknown_score')[0] == 400
+        assert get(url + '/top?k=two')[0] == 400
+        assert get(url + '/unknown')[0] == 404
@@ -0,0 +1,96 @@
+import pytest
+import pandas as pd
+from valinvest import sharding
+from valinvest.providers import BulkFileProvider
+from valinvest.sharding import partition_tickers, score_shard, merge_shards, run_local
+from valinvest.config import SP_500_TICKERS
+from .test_providers import write_bulk_file
+
+TICKERS = ('AAA', 'BBB', 'CCC', 'DDD', 'EEE')
+
+
+class TestPartition:
+
+    def test_partition(self):
+        shards = partition_tickers(SP_500_TICKERS, 8)
+        assert len(shards) == 8
+        assert sorted(sum(shards, [])) == sorted(set(SP_500_TICKERS))
+        assert partition_tickers(list(reversed(SP_500_TICKERS)), 8)[3] == sorted(
+            shards[3], key=list(reversed(SP_500_TICKERS)).index)
+
+    def test_wrong_shards(self):
+        with pytest.raises(ValueError):
+            partition_tickers(SP_500_TICKERS, 0)
+
+
+class TestShardedScores:
+
+    def test_score_and_merge(self, tmp_path):
+        path, profile_path = write_bulk_file(tmp_path / 'bulk.csv', TICKERS)
+        provider = BulkFileProvider(path, profile_path)
+
+        paths = []
+        for shard in range(3):
+            paths.append(str(tmp_path / 'part-{}.csv'.format(shard)))
+            score_shard(TICKERS, shard, 3, paths[-1], provider=provider)
+
+        scores = merge_shards(paths)
+        assert sorted(scores['ticker']) == sorted(TICKERS)
+        assert scores['fscore'].is_monotonic_decreasing
+        assert scores['rank'].iloc[0] == 1
+
+    def test_run_local(self, tmp_path):
+        path, profile_path = write_bulk_file(tmp_path / 'bulk.csv', TICKERS)
+        scores = run_local(TICKERS, 2, str(tmp_path / 'scores'), processes=2,
+                           worker_args=['--bulk-file', path, '--profile-file', profile_path])
+        assert sorted(scores['ticker']) == sorted(TICKERS)
+        assert scores.equals(pd.read_csv(tmp_path / 'scores' / 'scores.csv',
+                                         dtype={'rank': 'Int64', 'error': str}))
+
+    def test_failed_and_missing(self, tmp_path):
+        path, profile_path = write_bulk_file(tmp_path / 'bulk.csv', TICKERS)
+        provider = BulkFileProvider(path, profile_path)
+
+        paths = []
+        for shard in range(3):
+            paths.append(str(tmp_path / 'part-{}.csv'.format(shard)))
+            score_shard(TICKERS + ('ZZZ',), shard, 3, paths[-1], provider=provider)
+
+        scores = merge_shards(paths, ticker_list=TICKERS + ('ZZZ', 'YYY'))
+        assert list(scores['ticker'].iloc[-2:]) == ['YYY', 'ZZZ']
+        assert scores['rank'].iloc[-2:].isna().all()
+        assert scores['fscore'].iloc[-2:].isna().all()
+        errors = dict(zip(scores['ticker'], scores['error']))
+        assert 'provider' in errors['ZZZ']
+        assert errors['YYY'] == 'missing from the partial files'
+        assert scores['error'].iloc[:len(TICKERS)].isna().all()
+
+    def test_failed_worker(self, tmp_path, monkeypatch):
+        started = []
+        processes = []
+
+        class FakeProcess:
+            # Shard 0 runs until terminated, shard 1 succeeds, shard 2 fails
+            def __init__(self, args):
+                self.args = args
+                self.shard = int(args[args.index('--shard') + 1])
+                self.returncode = {0: None, 1: 0, 2: 1, 3: None}[self.shard]
+                started.append(self.shard)
+                processes.append(self)
+
+            def poll(self):
+                return self.returncode
+
+            def terminate(self):
+                self.returncode = -15
+
+            def wait(self):
+                return self.returncode
+
+        monkeypatch.setattr(sharding.subprocess, 'Popen', FakeProcess)
+        with pytest.raises(RuntimeError):
+            run_local(TICKERS, 4, str(tmp_path / 'scores'), processes=2)
+
+        # Shard 2 started when shard 1 exited, while shard 0 was still running
+        assert started == [0, 1, 2]
+        assert processes[0].returncode == -15
@@ -0,0 +1,145 @@
+import copy
+import pytest
+from valinvest import providers
+from valinvest.fundamentals import Fundamental
+from valinvest.providers import HttpProvider
+from valinvest.store import StatementStore, PointInTimeProvider
+from valinvest.synthetic import SyntheticProvider, HEADERS
+from .test_providers import FakeSession
+
+STATEMENTS = list(HEADERS)
+
+
+@pytest.fixture
+def synthetic():
+    return SyntheticProvider(n_tickers=3, years=15)
+
+
+@pytest.fixture
+def store(tmp_path, synthetic):
+    store = StatementStore(str(tmp_path / 'store'))
+    for ticker in synthetic.tickers:
+        for statement in STATEMENTS:
+            store.append(ticker, statement, synthetic.statement_payload(ticker, statement),
+                         retrieved='2020-01-15')
+        store.append(ticker, 'profile', synthetic.profile_payload(ticker), retrieved='2020-01-15')
+
+    # Restated revenue of the first ticker
+    payload = copy.deepcopy(synthetic.statement_payload('SYN000000', 'income-statement'))
+    payload['financials'][0]['Revenue'] = '1.0'
+    store.append('SYN000000', 'income-statement', payload, retrieved='2020-06-15')
+    return store
+
+
+def revenue(fundamental):
+    stmt = fundamental.statements
+    return stmt[(stmt['header'] == 'revenue') & (stmt['year'] == 2019)]['amount'].iloc[0]
+
+
+class TestStatementStore:
+
+    def test_append_only(self, store, synthetic):
+        assert len(store.index()) == 3 * 4 + 1
+        # Same payload as the latest version is not stored again
+        assert not store.append('SYN000001', 'income-statement',
+                                synthetic.statement_payload('SYN000001', 'income-statement'))
+
+    def test_two_writers(self, store, synthetic):
+        other = StatementStore(store.root)
+        v1 = synthetic.statement_payload('SYN000002', 'income-statement')
+        v2 = copy.deepcopy(v1)
+        v2['financials'][0]['Revenue'] = '2.0'
+
+        assert other.append('SYN000002', 'income-statement', v2, retrieved='2020-07-15')
+        # v1 is no longer the latest version, though it is for the first store object
+        assert store.append('SYN000002', 'income-statement', v1, retrieved='2020-07-15')
+        assert store.snapshot('2020-12-31')[('SYN000002', 'income-statement')] == v1
+        assert not other.append('SYN000002', 'income-statement', v1)
+
+    def test_backfill(self, store, synthetic):
+        new = copy.deepcopy(synthetic.statement_payload('SYN000002', 'income-statement'))
+        new['financials'][0]['Revenue'] = '3.0'
+        old = copy.deepcopy(new)
+        old['financials'][0]['Revenue'] = '2.0'
+
+        assert store.append('SYN000002', 'income-statement', new, retrieved='2020-06-01')
+        # Older snapshot, appended after the newer one
+        assert store.append('SYN000002', 'income-statement', old, retrieved='2020-03-01')
+        assert store.snapshot('2020-12-31')[('SYN000002', 'income-statement')] == new
+        assert store.snapshot('2020-04-01')[('SYN000002', 'income-statement')] == old
+
+        # Compared with the version known on the retrieval date
+        assert not store.append('SYN000002', 'income-statement', new, retrieved='2020-07-01')
+        assert store.append('SYN000002', 'income-statement', new, retrieved='2020-04-01')
+        assert store.snapshot('2020-05-01')[('SYN000002', 'income-statement')] == new
+
+    def test_as_of(self, store):
+        assert store.as_of('2019-12-31').empty
+        versions = store.as_of('2020-03-01')
+        assert len(versions) == 12
+        assert (versions['retrieved'] == '2020-01-15').all()
+
+        versions = store.as_of('2020-12-31', tickers=['syn000000'])
+        assert len(versions) == 4
+        assert versions.set_index('statement').loc['income-statement', 'retrieved'] == \
+            versions['retrieved'].max()
+
+    def test_snapshot(self, store):
+        before = store.snapshot('2020-03-01')
+        after = store.snapshot('2020-12-31')
+        assert len(before) == len(after) == 12
+        assert before[('SYN000000', 'income-statement')] != after[('SYN000000', 'income-statement')]
+        assert before[('SYN000001', 'income-statement')] == after[('SYN000001', 'income-statement')]
+
+
+class TestPointInTimeProvider:
+
+    def test_fscore(self, store, synthetic):
+        provider = PointInTimeProvider(store, '2020-03-01')
+        for ticker in synthetic.tickers:
+            past = Fundamental(ticker, provider=provider)
+            assert past.fscore() == Fundamental(ticker, provider=synthetic).fscore()
+            assert past.beta == synthetic.get_beta(ticker)
+
+    def test_snapshot_before_2019(self, tmp_path):
+        synthetic = SyntheticProvider(n_tickers=2, years=15, end_year=2014)
+        store = StatementStore(str(tmp_path / 'store'))
+        for ticker in synthetic.tickers:
+            for statement in STATEMENTS:
+                store.append(ticker, statement, synthetic.statement_payload(ticker, statement),
+                             retrieved='2015-03-01')
+            store.append(ticker, 'profile', synthetic.profile_payload(ticker), retrieved='2015-03-01')
+
+        provider = PointInTimeProvider(store, '2015-06-30')
+        # Same amounts, reported five years later
+        later = SyntheticProvider(n_tickers=2, years=15, end_year=2019)
+        for ticker in synthetic.tickers:
+            past = Fundamental(ticker, provider=provider)
+            assert past.statements['year'].max() == 2014
+            assert past.revenue_score() == Fundamental(ticker, provider=later).revenue_score()
+            assert past.fscore() == Fundamental(ticker, provider=later).fscore()
+
+    def test_as_of_dates(self, store):
+        before = Fundamental('SYN000000', provider=PointInTimeProvider(store, '2020-03-01'))
+        after = Fundamental('SYN000000', provider=PointInTimeProvider(store, '2020-12-31'))
+        assert revenue(before) != revenue(after) == 1
+
+    def test_unknown_ticker(self, store):
+        with pytest.raises(ValueError):
+            Fundamental('SYN000000', provider=PointInTimeProvider(store, '2019-12-31'))
+
+
+class TestRecording:
+
+    def test_http_provider(self, tmp_path, monkeypatch):
+        session = FakeSession()
+        monkeypatch.setattr(providers.requests, 'Session', lambda: session)
+        store = StatementStore(str(tmp_path / 'store'))
+        provider = HttpProvider('key', store=store)
+
+        aapl = Fundamental('AAPL', provider=provider)
+        Fundamental('AAPL', provider=provider)
+        assert len(store.index()) == 4
+
+        past = Fundamental('AAPL', provider=PointInTimeProvider(store, 'today'))
+        assert past.statements.equals(aapl.statements)
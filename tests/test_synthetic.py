@@ -0,0 +1,65 @@
+import pytest
+from valinvest.fundamentals import Fundamental
+from valinvest.providers import BulkFileProvider
+from valinvest.synthetic import SyntheticProvider, scaling_report
+
+
+def revenue(provider):
+    income = provider.get_financial_statement('SYN000003', 'income-statement')
+    return income[income['header'] == 'revenue'].set_index('year')['amount'].dropna().sort_index()
+
+
+@pytest.fixture
+def provider():
+    return SyntheticProvider(n_tickers=5, years=30, blank_rate=0.1, missing_rate=0.1)
+
+
+class TestSyntheticProvider:
+
+    def test_payloads(self, provider):
+        payload = provider.statement_payload('SYN000001', 'income-statement')
+        records = payload['financials']
+        assert len(records) == 30
+        assert records[0]['date'] == '2019-12-31'
+        assert any(value == '' for record in records for value in record.values())
+        assert any('Revenue' not in record for record in records)
+
+        # Deterministic
+        assert SyntheticProvider(n_tickers=5, years=30, blank_rate=0.1, missing_rate=0.1).statement_payload(
+            'SYN000001', 'income-statement') == payload
+        assert provider.statement_payload('SYN000002', 'income-statement') != payload
+
+    def test_quarterly_payloads(self, provider):
+        records = provider.statement_payload('SYN000001', 'balance-sheet-statement', 'quarter')['financials']
+        assert len(records) == 120
+
+    def test_tickers(self, provider):
+        assert provider.has_ticker('SYN000004')
+        assert not provider.has_ticker('SYN000005')
+        with pytest.raises(ValueError):
+            Fundamental('AAPL', provider=provider)
+
+    def test_fscore(self, provider):
+        for ticker in provider.tickers:
+            assert 0 <= Fundamental(ticker, provider=provider).fscore() <= 9
+        assert 0 <= Fundamental('SYN000000', provider=provider, period='quarter').fscore() <= 9
+
+    def test_bulk_frames(self, provider, tmp_path):
+        statements, profiles = provider.to_bulk_frames()
+        statements.to_csv(tmp_path / 'statements.csv', index=False)
+        profiles.to_csv(tmp_path / 'profiles.csv', index=False)
+        bulk = BulkFileProvider(str(tmp_path / 'statements.csv'), str(tmp_path / 'profiles.csv'))
+
+        assert bulk.get_beta('SYN000003') == provider.get_beta('SYN000003')
+        assert revenue(bulk).equals(revenue(provider))
+
+
+class TestScalingReport:
+
+    def test_report(self):
+        report = scaling_report(ticker_counts=[4], year_counts=[10], processes=[1, 2])
+        assert list(report['processes']) == [1, 2]
+        assert list(report['densified_years']) == [11, 11]
+        assert report['tickers_per_second'].gt(0).all()
+        assert report['peak_memory_mb'].gt(0).all()
+        assert report['speedup'].iloc[0] == 1
@@ -1,4 +1,6 @@
-
 from .config import NASDAQ_100_TICKERS, SP_500_TICKERS
 from .fundamentals import Fundamental
 from .main import get_tickers_scores
+from .providers import StatementProvider, HttpProvider, BulkFileProvider
+from .cache import ScoreCache
+from .store import StatementStore, PointInTimeProvider
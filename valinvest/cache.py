@@ -0,0 +1,116 @@
+import os
+import json
+import hashlib
+import sqlite3
+import pandas as pd
+
+CACHE_DIR = os.environ.get(
+    "VALINVEST_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "valinvest"))
+
+# Version of the scoring logic, part of the cache keys.
+# Bump it whenever a change gives other scores for the same statements.
+SCORING_VERSION = 2
+
+
+def statements_fingerprint(statements, beta=None):
+    """Returns a hash of densified statements, and beta.
+
+    Parameters
+    ----------
+    statements : pandas.DataFrame
+        statements of a Fundamental object
+    beta : float, optional
+        beta of the company, if the hashed statements are used with it
+
+    Returns
+    -------
+    str
+        Hexadecimal SHA-256 digest.
+    """
+    hashes = pd.util.hash_pandas_object(statements, index=False).values
+    digest = hashlib.sha256(hashes.tobytes())
+    if beta is not None:
+        digest.update(repr(float(beta)).encode())
+    return digest.hexdigest()
+
+
+class ScoreCache:
+    """Persistent score cache, content-addressed by statements fingerprint.
+
+    Scores are stored in a SQLite file, which can be shared by several processes and runs.
+    As the key is a hash of the statements, the scoring parameters and SCORING_VERSION,
+    entries never need to be invalidated: changed statements or scoring logic give a new key.
+
+    Parameters
+    ----------
+    path : str, optional
+        SQLite file, by default scores.sqlite in $VALINVEST_CACHE_DIR (~/.cache/valinvest)
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(CACHE_DIR, "scores.sqlite")
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        con = self._connect()
+        try:
+            with con:
+                con.execute("CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY, score REAL)")
+        finally:
+            con.close()
+
+    def _connect(self):
+        # One connection per call: safe across threads and forked processes.
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def key(fingerprint, name, **params):
+        """Returns the cache key of a score.
+
+        Parameters
+        ----------
+        fingerprint : str
+            statements fingerprint
+        name : str
+            score name, ex: "fscore", "roic_score"
+        **params
+            scoring parameters, ex: years, period
+
+        Returns
+        -------
+        str
+            Hexadecimal SHA-256 digest.
+        """
+        payload = json.dumps([SCORING_VERSION, fingerprint, name, params], sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        """Returns the cached score, None if missing."""
+        con = self._connect()
+        try:
+            row = con.execute("SELECT score FROM scores WHERE key = ?", (key,)).fetchone()
+        finally:
+            con.close()
+        return None if row is None else row[0]
+
+    def set(self, key, score):
+        """Stores a score."""
+        con = self._connect()
+        try:
+            with con:
+                con.execute("INSERT OR REPLACE INTO scores (key, score) VALUES (?, ?)",
+                            (key, float(score)))
+        finally:
+            con.close()
+
+    def clear(self):
+        """Removes all cached scores."""
+        con = self._connect()
+        try:
+            with con:
+                con.execute("DELETE FROM scores")
+        finally:
+            con.close()
@@ -1,15 +1,88 @@
-import requests
+import functools
+import inspect
+import threading
+from collections import OrderedDict
 import pandas as pd
-import io
-import re
 import numpy as np
+from .cache import ScoreCache, statements_fingerprint
+from .providers import (StatementProvider, _default_provider, STATEMENT_API_URL, BETA_API_URL,
+                        INCOME_STATEMENT, BALANCE_STATEMENT, CASH_FLOW_STATEMENT, PERIODS)
 from .config import SP_500_TICKERS, NASDAQ_100_TICKERS
 
-STATEMENT_API_URL = "https://financialmodelingprep.com/api/v3/financials/{statement}/{ticker}?apikey={apikey}"
-BETA_API_URL = "https://financialmodelingprep.com/api/v3/company/profile/{ticker}?apikey={apikey}"
-INCOME_STATEMENT = "income-statement"
-BALANCE_STATEMENT = "balance-sheet-statement"
-CASH_FLOW_STATEMENT = "cash-flow-statement"
+# Pseudo statement holding the beta row of the statements
+BETA = "beta"
+
+# Densified statements, by ticker, period, statement, fingerprint and years (least recently used first)
+DENSIFIED_CACHE_SIZE = 1536
+_densified = OrderedDict()
+_densified_lock = threading.Lock()
+
+
+def _densify(statement, years):
+    """Returns a statement with one row per header and year, amounts of missing years being 0.
+
+    Parameters
+    ----------
+    statement : pandas.DataFrame
+        long statement with ticker, statement, header, year and amount columns
+    years : range
+        years of the densified statement
+
+    Returns
+    -------
+    pandas.DataFrame
+        year, ticker, statement, header and amount columns, sorted by header and year.
+    """
+    dates = pd.DataFrame(years, columns=['year'])
+    dates['key'] = 1
+    headers_index = (statement.groupby(['ticker', 'statement', 'header'])
+                              .size()
+                              .reset_index()[['ticker', 'statement', 'header']])
+    headers_index['key'] = 1
+
+    cartesian_step = pd.merge(dates, headers_index, on='key')
+    del cartesian_step['key']
+
+    res = pd.merge(cartesian_step, statement, on=[
+                   'year', 'ticker', 'statement', 'header'], how='left')
+
+    res['amount'] = res['amount'].fillna(0).astype(np.float64)
+
+    return res.sort_values(by=["ticker", "statement", "header", "year"]).reset_index(drop=True)
+
+
+def _cached_score(*statements):
+    """Looks the score up in the Fundamental cache before computing it, and stores it on a miss.
+    The cache key depends only on the statements the score is computed from.
+
+    Parameters
+    ----------
+    *statements : str
+        statements (and BETA) the score is computed from
+    """
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.cache is None:
+                return method(self, *args, **kwargs)
+
+            params = signature.bind(self, *args, **kwargs)
+            params.apply_defaults()
+            del params.arguments["self"]
+
+            key = self.cache.key(self._fingerprint(statements), method.__name__,
+                                 period=self.period, **params.arguments)
+            score = self.cache.get(key)
+            if score is None:
+                score = method(self, *args, **kwargs)
+                self.cache.set(key, score)
+            return score
+
+        return wrapper
+
+    return decorator
 
 
 class Fundamental:
@@ -22,17 +95,37 @@ class Fundamental:
         symbol of the company to analyse
 
     api_key : str
-        Financial Modeling Prep API Key (get yours at https://financialmodelingprep.com/login)
+        Financial Modeling Prep API Key (get yours at https://financialmodelingprep.com/login).
+        Only required when no provider is given.
+
+    provider : StatementProvider, optional
+        source of the financial statements, by default an HttpProvider built with api_key,
+        serving the SP500 and NASDAQ100 tickers, and shared by the objects built with the same api_key
+
+    period : str, optional
+        "annual" or "quarter", by default "annual". In quarter mode, metrics are computed on
+        trailing twelve months amounts, one point per year back from the latest quarter.
+        Metrics cover the ten years up to the latest year reported by the statements.
+
+    cache : ScoreCache, optional
+        persistent cache of the scores, keyed by a hash of the statements and the scoring parameters.
+        By default, scores are always computed.
+
+    lazy : bool, optional
+        if True, each statement and the beta are fetched only when a metric first needs them,
+        ex: revenue_score only fetches the income statement. By default, everything is fetched at creation.
 
     Raises
     ------
     TypeError
-        raised when ticker is not a string
+        raised when ticker is not a string, provider is not a StatementProvider
+        or cache is not a ScoreCache
     ValueError
-        raised when ticker is not listed on SP500 or NASDAQ100 markets.
+        raised when ticker is not served by the provider
+        (by default, not listed on SP500 or NASDAQ100 markets), or period is unknown.
     """
 
-    def __init__(self, ticker, apikey):
+    def __init__(self, ticker, apikey=None, provider=None, period="annual", cache=None, lazy=False):
         self.statement_strings = [
             INCOME_STATEMENT,
             BALANCE_STATEMENT,
@@ -43,21 +136,78 @@ class Fundamental:
         if not isinstance(ticker, str):
             raise TypeError("Ticker should be a string.")
 
-        if not isinstance(apikey, str):
-            raise TypeError("API KEY should be a string.")
+        if provider is None:
+            provider = _default_provider(apikey, NASDAQ_100_TICKERS + SP_500_TICKERS)
+
+        if not isinstance(provider, StatementProvider):
+            raise TypeError("Provider should be a StatementProvider.")
+
+        if period not in PERIODS:
+            raise ValueError("Period should be either 'annual' or 'quarter'")
+
+        if cache is not None and not isinstance(cache, ScoreCache):
+            raise TypeError("Cache should be a ScoreCache.")
 
         self.ticker = ticker.upper()
         self.apikey = apikey
-
-        # Checks if ticker in SP500 or NASDAQ
-        if self.ticker not in NASDAQ_100_TICKERS and self.ticker not in SP_500_TICKERS:
+        self.provider = provider
+        self.period = period
+        self.cache = cache
+        self.lazy = lazy
+
+        # Fetched statements, by statement, and fetched statements (BETA included) in fetch order
+        self._frames = {}
+        self._loaded = []
+        self._beta = None
+        # Densified statements and their hash, by requested statements (BETA included)
+        self._views = {}
+        self._fingerprints = {}
+        # Densified statements, by statement and years
+        self._dense = {}
+
+        # Checks if ticker is served by the provider (SP500 or NASDAQ for the default provider)
+        if not self.provider.has_ticker(self.ticker):
             raise ValueError(
-                "Ticker should be a NASDAQ 100 ticker or SP 500 ticker")
+                "Ticker should be available from the provider (NASDAQ 100 or SP 500 ticker by default)")
 
-        self.statements = self._get_financial_statements()
+        if not self.lazy:
+            self._require(*self.statement_strings, BETA)
+
+    @property
+    def statements(self):
+        """Returns the three financial statements and the beta, densified in one DataFrame.
+        In lazy mode, fetches the missing ones.
+
+        Returns
+        -------
+        pandas.DataFrame
+            ticker, statement, header, year and amount columns.
+        """
+        return self._require(*self.statement_strings, BETA)
+
+    def _require(self, *statements):
+        """Returns the requested statements densified, after fetching the missing ones (lazy mode).
+        The densified years only depend on the requested statements, not on the ones fetched before,
+        so a score is the same in lazy and eager mode.
+
+        Parameters
+        ----------
+        *statements : str
+            statements (and BETA) needed by the caller
+
+        Returns
+        -------
+        pandas.DataFrame
+            Densified requested statements.
+        """
+        key = tuple(statement for statement in self.statement_strings + [BETA]
+                    if statement in statements)
+        if key not in self._views:
+            self._views[key] = self._get_financial_statements(key)
+        return self._views[key]
 
     def _get_financial_statement(self, statement):
-        """ Get financial statement from Financial Modeling Prep API.
+        """ Get financial statement from the provider.
         This method can retrieve the three key financial reports, ie balance sheet, cash flow and income statements.
 
         Parameters
@@ -68,74 +218,127 @@ class Fundamental:
         Returns
         -------
         pandas.DataFrame
-            DataFrame-shaped requested financial report.
+            DataFrame-shaped requested financial report, trailing twelve months amounts in quarter mode.
         """
-        url = STATEMENT_API_URL.format(
-            statement=statement,
-            ticker=self.ticker,
-            apikey=self.apikey)
+        return self.provider.get_financial_statement(self.ticker, statement, self.period)
 
-        res = requests.get(url).json()
+    def _get_financial_statements(self, statements=None):
+        """Fetch the requested statements if not already fetched, and merge them in one DataFrame,
+        over the eleven years up to the latest year they report.
+        Each statement is densified on its own, once while the provider returns the same fingerprint,
+        so fetching one more statement does not densify the others again.
 
-        df = pd.json_normalize(res["financials"])
+        Parameters
+        ----------
+        statements : list of str, optional
+            statements (and BETA) to fetch, by default all three and the beta
 
-        df["ticker"] = self.ticker
-        df["statement"] = statement
-        df["year"] = pd.to_datetime(df["date"]).dt.year
-        df.columns = [column.replace(' ', '_').lower()
-                      for column in df.columns]
-        del df["date"]
+        Returns
+        -------
+        pandas.DataFrame
+            Requested financial reports in a DataFrame format.
+        """
+        if statements is None:
+            statements = self.statement_strings + [BETA]
 
-        df.set_index(["ticker", "statement", "year"], inplace=True)
+        for statement in statements:
+            if statement not in self._loaded:
+                if statement != BETA:
+                    self._frames[statement] = self._get_financial_statement(statement)
+                self._loaded.append(statement)
 
-        financials_series = (df.stack()
-                             .replace('', np.nan)
-                             .astype(np.float32))
+        requested = [statement for statement in self.statement_strings if statement in statements]
+        max_year = pd.Series([self._frames[statement]["year"].max() for statement in requested]).max()
 
-        financials_series.rename('amount', inplace=True)
+        if np.isnan(max_year):
+            raise ValueError("Requested Company does not have any statement available.")
 
-        financials_series.index.set_names(
-            ['ticker', 'statement', 'year', 'header'], inplace=True)
+        # Eleven years up to the latest reported year, or trailing twelve months in quarter mode
+        last_year = int(max_year)
+        years = range(last_year - 10, last_year + 1)
 
-        result = financials_series.reorder_levels(
-            ['ticker', 'statement', 'header', 'year'])
+        dense = {statement: self._densified(statement, years) for statement in requested}
 
-        return result.sort_index(level=3).reset_index()
+        if BETA in statements:
+            dense[BETA] = pd.DataFrame({'year': years, 'ticker': self.ticker,
+                                        'statement': BETA, 'header': BETA,
+                                        'amount': [self.beta if year == max_year else 0.
+                                                   for year in years]})
 
-    def _get_financial_statements(self):
-        """Merge the three financials statements in one DataFrame.
+        # Statements sorted by name, as sorting the merged statements would
+        return pd.concat([dense[statement] for statement in sorted(dense)], ignore_index=True)
+
+    def _densified(self, statement, years):
+        """Returns a densified statement, computed once per Fundamental object,
+        and reused by other objects while its fingerprint is unchanged.
+
+        Parameters
+        ----------
+        statement : str
+            fetched statement
+        years : range
+            years of the densified statement
 
         Returns
         -------
         pandas.DataFrame
-            All three financial reports in a DataFrame format.
+            Densified statement.
         """
-        res = pd.DataFrame(
-            [], columns=['ticker', 'statement', 'header', 'year', 'amount'])
-        for statement in self.statement_strings:
-            res = pd.concat([res, self._get_financial_statement(statement)])
+        if (statement, years) in self._dense:
+            return self._dense[(statement, years)]
+
+        df = self._frames[statement]
+        fingerprint = df.attrs.get("fingerprint")
+        key = (self.ticker, self.period, statement, fingerprint, years.start, years.stop)
+        res = None
+        if fingerprint is not None:
+            with _densified_lock:
+                if key in _densified:
+                    _densified.move_to_end(key)
+                    res = _densified[key]
+
+        if res is None:
+            res = _densify(df, years)
+            if fingerprint is not None:
+                with _densified_lock:
+                    _densified[key] = res
+                    if len(_densified) > DENSIFIED_CACHE_SIZE:
+                        _densified.popitem(last=False)
+
+        self._dense[(statement, years)] = res
+        return res
 
-        res.loc[-1] = [self.ticker, "beta", "beta",
-                       res["year"].max(), self.beta]
-
-        dates = pd.DataFrame(range(2009, 2020), columns=['year'])
-        dates['key'] = 1
-        headers_index = (res.groupby(['ticker', 'statement', 'header'])
-                            .size()
-                            .reset_index()[['ticker', 'statement', 'header']])
-        headers_index['key'] = 1
+    @property
+    def fingerprint(self):
+        """Returns the hash of the statements (beta included).
 
-        cartesian_step = pd.merge(dates, headers_index, on='key')
-        del cartesian_step['key']
+        Returns
+        -------
+        str
+            Hexadecimal SHA-256 digest.
+        """
+        return self._fingerprint(self.statement_strings + [BETA])
 
-        res = pd.merge(cartesian_step, res, on=[
-                       'year', 'ticker', 'statement', 'header'], how='left')
+    def _fingerprint(self, statements):
+        """Returns the hash of some of the statements, key of the cached scores computed from them.
 
-        res['amount'].fillna(0, inplace=True)
+        Parameters
+        ----------
+        statements : list of str
+            statements (and BETA) to hash
 
-        return res.sort_values(by=["ticker", "statement", "header", "year"]).reset_index(drop=True)
+        Returns
+        -------
+        str
+            Hexadecimal SHA-256 digest.
+        """
+        statements = tuple(statements)
+        if statements not in self._fingerprints:
+            self._fingerprints[statements] = statements_fingerprint(
+                self._require(*statements), self.beta if BETA in statements else None)
+        return self._fingerprints[statements]
 
-    def _metric_growth(self, header, name):
+    def _metric_growth(self, header, name, statement=INCOME_STATEMENT):
         """Returns if the obversed financial statement 'header' value is growing from one year to another.
         Compute growth (1 if increase else 0)
 
@@ -145,6 +348,8 @@ class Fundamental:
             Label of the financial statement header. Ex: EBITDA, Total liabilities, interest expense, etc.
         name : str
             Name of the metric
+        statement : str, optional
+            Statement reporting the header, by default "income-statement"
 
         Returns
         -------
@@ -156,13 +361,16 @@ class Fundamental:
         ValueError
             Raised if header is not in the data.
         """
-        if header not in self.statements["header"].values:
+        stmt = self._require(statement)
+        stmt = stmt[stmt["statement"] == statement]
+
+        if header not in stmt["header"].values:
             raise ValueError(
                 "Requested Company does not have {header} available.".format(
-                    header)
+                    header=header)
             )
 
-        _header_df = self.statements[self.statements["header"] == str(
+        _header_df = stmt[stmt["header"] == str(
             header)][["year", "amount"]].copy()
         _header_df.set_index("year", inplace=True)
         _header_df.sort_index(inplace=True)
@@ -183,14 +391,9 @@ class Fundamental:
         float
             Beta
         """
-        url = BETA_API_URL.format(ticker=self.ticker, apikey=self.apikey)
-        res = requests.get(url).json()
-
-        beta = float("inf")
-        if res["profile"]["beta"]:
-            beta = float(res["profile"]["beta"])
-
-        return beta
+        if self._beta is None:
+            self._beta = self.provider.get_beta(self.ticker)
+        return self._beta
 
     @property
     def eps_growth(self):
@@ -237,7 +440,7 @@ class Fundamental:
         pandas.Series
             Serie of 0 and 1. 1 if ROIC > 10%.
         """
-        stmt = self.statements
+        stmt = self._require(INCOME_STATEMENT, BALANCE_STATEMENT)
 
         operating_income = stmt[
             (stmt["header"] == "operating_income")
@@ -307,7 +510,7 @@ class Fundamental:
         pandas.Series
             Serie of 0 and 1. 1 if CROIC > 10%.
         """
-        stmt = self.statements
+        stmt = self._require(INCOME_STATEMENT, BALANCE_STATEMENT, CASH_FLOW_STATEMENT)
 
         free_cash_flow = stmt[
             (stmt["header"] == "free_cash_flow")
@@ -350,7 +553,7 @@ class Fundamental:
         pandas.Series
             Serie of 0 and 1. 1 if coverage > 6.
         """
-        stmt = self.statements
+        stmt = self._require(INCOME_STATEMENT)
 
         interest_expense = stmt[
             (stmt["header"] == "interest_expense")
@@ -390,8 +593,11 @@ class Fundamental:
         pandas.Series
             Serie of 0 and 1. 1 if number of shares decreased.
         """
-        _header_df = self.statements[self.statements["header"] == "weighted_average_shs_out_(dil)"][[
-            "year", "amount"]].copy()
+        stmt = self._require(INCOME_STATEMENT)
+        _header_df = stmt[
+            (stmt["header"] == "weighted_average_shs_out_(dil)")
+            & (stmt["statement"] == "income-statement")
+        ][["year", "amount"]].copy()
         _header_df.set_index("year", inplace=True)
         _header_df.sort_index(inplace=True)
         _header = _header_df.squeeze()
@@ -411,7 +617,7 @@ class Fundamental:
         pandas.Series
             Serie of 0 and 1. 1 if cost of debt < 0.05.
         """
-        stmt = self.statements
+        stmt = self._require(INCOME_STATEMENT, BALANCE_STATEMENT)
 
         interest_expense = stmt[
             (stmt["header"] == "interest_expense")
@@ -468,6 +674,7 @@ class Fundamental:
 
         return property[-years:].sum() / years
 
+    @_cached_score(INCOME_STATEMENT)
     def eps_score(self, years=10):
         """Returns EPS score
 
@@ -483,6 +690,7 @@ class Fundamental:
         """
         return self._score(self.eps_growth, years)
 
+    @_cached_score(INCOME_STATEMENT)
     def revenue_score(self, years=10):
         """Returns revenue score
 
@@ -498,6 +706,7 @@ class Fundamental:
         """
         return self._score(self.revenue_growth, years)
 
+    @_cached_score(INCOME_STATEMENT)
     def ebitda_score(self, years=10):
         """Returns EBITDA score
 
@@ -513,6 +722,7 @@ class Fundamental:
         """
         return self._score(self.ebitda_growth, years)
 
+    @_cached_score(INCOME_STATEMENT, BALANCE_STATEMENT)
     def roic_score(self, years=10):
         """Returns ROIC score
 
@@ -528,6 +738,7 @@ class Fundamental:
         """
         return self._score(self.roic_growth, years)
 
+    @_cached_score(INCOME_STATEMENT, BALANCE_STATEMENT, CASH_FLOW_STATEMENT)
     def croic_score(self, years=10):
         """Returns CROIC score
 
@@ -543,6 +754,7 @@ class Fundamental:
         """
         return self._score(self.croic_growth, years)
 
+    @_cached_score(INCOME_STATEMENT, BALANCE_STATEMENT)
     def debt_cost_score(self, years=10):
         """Returns debt cost score
 
@@ -558,6 +770,7 @@ class Fundamental:
         """
         return self._score(self.debt_cost_growth, years)
 
+    @_cached_score(INCOME_STATEMENT)
     def eq_buyback_score(self, years=10):
         """Returns equity buyback score
 
@@ -573,6 +786,7 @@ class Fundamental:
         """
         return self._score(self.eq_buyback_growth, years)
 
+    @_cached_score(INCOME_STATEMENT)
     def ebitda_cover_score(self, years=10):
         """Returns EBITDA cover score
 
@@ -598,6 +812,7 @@ class Fundamental:
         """
         return 1 if self.beta <= 1.0 else 0
 
+    @_cached_score(INCOME_STATEMENT, BALANCE_STATEMENT, CASH_FLOW_STATEMENT, BETA)
     def fscore(self, years=10):
         """Returns the sum of all scores, also known as custom F-Score
 
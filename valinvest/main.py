@@ -1,14 +1,78 @@
+import os
+import argparse
 from .fundamentals import Fundamental
-from .config import SP_500_TICKERS, NASDAQ_100_TICKERS
+from .providers import BulkFileProvider, _default_provider
+from .cache import ScoreCache
+from .config import SP_500_TICKERS, NASDAQ_100_TICKERS, UNIVERSES
 
 
-def get_tickers_scores(ticker_list=NASDAQ_100_TICKERS):
+def get_tickers_scores(ticker_list=NASDAQ_100_TICKERS, apikey=None, provider=None, cache=None,
+                       errors=None):
+    """Returns the F-Score of every ticker of a list.
+
+    Parameters
+    ----------
+    ticker_list : list of str, optional
+        tickers to score, by default NASDAQ 100 tickers
+    apikey : str, optional
+        Financial Modeling Prep API Key, only required when no provider is given
+    provider : StatementProvider, optional
+        source of the financial statements shared by all tickers, by default the HttpProvider of apikey
+    cache : ScoreCache, optional
+        persistent cache of the scores, by default scores are always computed
+    errors : dict, optional
+        filled with the error message of every ticker that could not be scored
+
+    Returns
+    -------
+    list
+        [ticker, score] pairs of the tickers that could be scored.
+    """
+    if provider is None:
+        provider = _default_provider(apikey)
+
     res = []
     for ticker in ticker_list:
         try:
-            score = Fundamental(ticker).fscore()
+            score = Fundamental(ticker, provider=provider, cache=cache).fscore()
             res.append([ticker, score])
             print(ticker, score)
         except Exception as e:
             print(ticker, e)
+            if errors is not None:
+                errors[ticker] = str(e) or type(e).__name__
     return res
+
+
+def _source_parser():
+    """Returns the parent parser of the universe and data source options shared by the command lines."""
+    source = argparse.ArgumentParser(add_help=False)
+    tickers = source.add_mutually_exclusive_group()
+    tickers.add_argument("--universe", choices=sorted(UNIVERSES), default="nasdaq100")
+    tickers.add_argument("--tickers-file", help="one ticker per line")
+    source.add_argument("--apikey", help="by default $VALINVEST_APIKEY")
+    source.add_argument("--bulk-file", help="CSV or Parquet statements, instead of the API")
+    source.add_argument("--profile-file", help="CSV or Parquet betas of the bulk file")
+    source.add_argument("--cache", help="ScoreCache SQLite file")
+    return source
+
+
+def _read_tickers(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _tickers(args):
+    if args.tickers_file:
+        return _read_tickers(args.tickers_file)
+    return UNIVERSES[args.universe]
+
+
+def _provider(args):
+    if args.bulk_file:
+        return BulkFileProvider(args.bulk_file, args.profile_file)
+    return _default_provider(args.apikey or os.environ.get("VALINVEST_APIKEY", ""))
+
+
+def _cache(args):
+    return ScoreCache(args.cache) if args.cache else None
@@ -0,0 +1,431 @@
+import os
+import abc
+import hashlib
+import threading
+import requests
+import pandas as pd
+import numpy as np
+
+STATEMENT_API_URL = "https://financialmodelingprep.com/api/v3/financials/{statement}/{ticker}?apikey={apikey}"
+BETA_API_URL = "https://financialmodelingprep.com/api/v3/company/profile/{ticker}?apikey={apikey}"
+INCOME_STATEMENT = "income-statement"
+BALANCE_STATEMENT = "balance-sheet-statement"
+CASH_FLOW_STATEMENT = "cash-flow-statement"
+PERIODS = ("annual", "quarter")
+
+# Flow headers averaged rather than summed over the trailing twelve months.
+TTM_MEAN_HEADERS = r"^weighted_average_shs_out|_margin$"
+
+
+def _trailing_twelve_months(financials_series):
+    """Aggregate quarterly amounts into trailing twelve months (TTM) amounts.
+    Income and cash flow items are summed over the last four quarters, share counts and margins
+    are averaged, balance sheet items are taken at the last quarter.
+    One TTM point is kept every four quarters, back from the latest quarter of each ticker,
+    and labelled with the year of that quarter.
+
+    Parameters
+    ----------
+    financials_series : pandas.Series
+        Quarterly amounts indexed by ticker, statement, quarter (year * 4 + quarter - 1) and header.
+
+    Returns
+    -------
+    pandas.Series
+        TTM amounts indexed by ticker, statement, year and header.
+    """
+    quarters = (financials_series
+                .groupby(level=['ticker', 'statement', 'header', 'quarter'])
+                .last()
+                .unstack('quarter'))
+    quarters = quarters.reindex(
+        columns=range(quarters.columns.min(), quarters.columns.max() + 1))
+
+    rolling = quarters.T.rolling(4, min_periods=4)
+    statement = quarters.index.get_level_values('statement')
+    header = quarters.index.get_level_values('header')
+    flow = (statement != BALANCE_STATEMENT)[:, None]
+    mean = header.str.contains(TTM_MEAN_HEADERS)[:, None]
+
+    ttm = pd.DataFrame(np.where(flow,
+                                np.where(mean, rolling.mean().T, rolling.sum().T),
+                                quarters),
+                       index=quarters.index,
+                       columns=quarters.columns).stack().dropna().rename('amount').reset_index()
+
+    # Anchored on the latest reported quarter of each ticker, not on the reindexed columns
+    latest = ttm.groupby('ticker')['quarter'].transform('max')
+    ttm = ttm[(latest - ttm['quarter']) % 4 == 0]
+    ttm['year'] = ttm['quarter'] // 4
+
+    return ttm.set_index(['ticker', 'statement', 'year', 'header'])['amount'].astype(np.float32)
+
+
+def _stack_statements(df, period="annual"):
+    """Turn wide statements (one row per ticker, statement and date, one column per header)
+    into the long format used by Fundamental.
+    Works on any number of tickers and statements at once.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Wide statements with "ticker", "statement" and "date" columns.
+    period : str, optional
+        "annual" or "quarter". Quarterly statements are aggregated into trailing twelve months amounts.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Long statements with ticker, statement, header, year and amount columns.
+    """
+    df = df.copy()
+    dates = pd.to_datetime(df["date"])
+    if period == "quarter":
+        # Rounded to the nearest calendar quarter end, as 52/53-week fiscal quarters end a few days
+        # before or after it, and sorted so that the latest report of a quarter is kept
+        key = "quarter"
+        rounded = dates + pd.Timedelta(days=46)
+        df[key] = rounded.dt.year * 4 + rounded.dt.quarter - 2
+        df = df.iloc[np.argsort(dates.values, kind="stable")]
+    else:
+        key = "year"
+        df[key] = dates.dt.year
+    df.columns = [column.replace(' ', '_').lower()
+                  for column in df.columns]
+    del df["date"]
+
+    df.set_index(["ticker", "statement", key], inplace=True)
+
+    # Missing cells are headers the statement does not report, blanks are reported but empty.
+    financials_series = (df.stack()
+                         .dropna()
+                         .replace('', np.nan)
+                         .astype(np.float32))
+
+    financials_series.rename('amount', inplace=True)
+
+    financials_series.index.set_names(
+        ['ticker', 'statement', key, 'header'], inplace=True)
+
+    if period == "quarter":
+        financials_series = _trailing_twelve_months(financials_series)
+
+    result = financials_series.reorder_levels(
+        ['ticker', 'statement', 'header', 'year'])
+
+    return result.sort_index(level=3).reset_index()
+
+
+def _parse_financials(res, ticker, statement, period="annual"):
+    """Parse a Financial Modeling Prep statement payload.
+
+    Parameters
+    ----------
+    res : dict
+        decoded JSON payload, with a "financials" list
+    ticker : str
+        upper-cased symbol of the company
+    statement : str
+        statement of the payload
+    period : str, optional
+        "annual" or "quarter", by default "annual"
+
+    Returns
+    -------
+    pandas.DataFrame
+        Long statement with ticker, statement, header, year and amount columns.
+    """
+    df = pd.json_normalize(res["financials"])
+
+    df["ticker"] = ticker
+    df["statement"] = statement
+
+    return _stack_statements(df, period)
+
+
+def _parse_beta(res):
+    """Returns the beta of a Financial Modeling Prep profile payload, inf if unknown."""
+    beta = float("inf")
+    if res["profile"]["beta"]:
+        beta = float(res["profile"]["beta"])
+
+    return beta
+
+
+class StatementProvider(abc.ABC):
+    """Base class of the financial data sources used by Fundamental.
+
+    A provider returns the three financial statements and the beta of a ticker.
+    Subclasses must implement `get_financial_statement` and `get_beta`,
+    a provider missing one of them cannot be instantiated.
+    """
+
+    def has_ticker(self, ticker):
+        """Returns True if the provider can serve the given ticker.
+
+        Parameters
+        ----------
+        ticker : str
+            upper-cased symbol of the company
+
+        Returns
+        -------
+        bool
+        """
+        return True
+
+    @abc.abstractmethod
+    def get_financial_statement(self, ticker, statement, period="annual"):
+        """Returns a financial statement of a ticker.
+
+        Parameters
+        ----------
+        ticker : str
+            upper-cased symbol of the company
+        statement : str
+            Should be either "balance-sheet-statement", "cash-flow-statement" or "income-statement"
+        period : str, optional
+            "annual" or "quarter", by default "annual".
+            Quarterly statements are returned as yearly spaced trailing twelve months amounts.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Long statement with ticker, statement, header, year and amount columns.
+            attrs["fingerprint"] may hold a hash of the source data, identical for unchanged statements.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_beta(self, ticker):
+        """Returns beta (volatility of the security vs market), inf if unknown.
+
+        Parameters
+        ----------
+        ticker : str
+            upper-cased symbol of the company
+
+        Returns
+        -------
+        float
+            Beta
+        """
+        raise NotImplementedError
+
+
+class HttpProvider(StatementProvider):
+    """Financial Modeling Prep API provider, one request per ticker and statement.
+
+    Responses are revalidated: the provider keeps the ETag / Last-Modified validators and the parsed
+    result of each URL, sends conditional requests, and reuses the parsed result when the server
+    replies "304 Not Modified" or the body is unchanged. Statements are returned with a
+    "fingerprint" attribute (hash of the body), which lets Fundamental reuse densified statements.
+    The provider can be shared by several threads, each thread has its own HTTP session.
+
+    Parameters
+    ----------
+    apikey : str
+        Financial Modeling Prep API Key (get yours at https://financialmodelingprep.com/login)
+    store : StatementStore, optional
+        point-in-time store where every new payload is appended, by default payloads are not kept
+    tickers : list of str, optional
+        tickers served by the provider, ex: SP_500_TICKERS. By default, any ticker is requested.
+
+    Raises
+    ------
+    TypeError
+        raised when apikey is not a string
+    """
+
+    def __init__(self, apikey, store=None, tickers=None):
+        if not isinstance(apikey, str):
+            raise TypeError("API KEY should be a string.")
+
+        self.apikey = apikey
+        self.store = store
+        self.tickers = None if tickers is None else {ticker.upper() for ticker in tickers}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # url -> (etag, last modified, body digest, parsed body)
+        self._validated = {}
+
+    @property
+    def session(self):
+        """requests.Session of the calling thread, as sessions are not thread-safe."""
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _get(self, url, parse, record):
+        """GET an url, parse the JSON body, unless it did not change since the last request.
+
+        Parameters
+        ----------
+        url : str
+            url to request
+        parse : callable
+            function of the decoded JSON body
+        record : tuple
+            ticker, statement and period of the payload in the store
+
+        Returns
+        -------
+        tuple
+            parsed body, and SHA-256 digest of the body
+        """
+        with self._lock:
+            cached = self._validated.get(url)
+        headers = {}
+        if cached is not None:
+            etag, last_modified, digest, value = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        res = self.session.get(url, headers=headers)
+
+        if res.status_code == 304 and cached is not None:
+            return value, digest
+
+        body_digest = hashlib.sha256(res.content).hexdigest()
+        if cached is None or body_digest != digest:
+            payload = res.json()
+            value = parse(payload)
+            if self.store is not None and res.ok:
+                ticker, statement, period = record
+                self.store.append(ticker, statement, payload, period)
+
+        if res.ok:
+            with self._lock:
+                self._validated[url] = (res.headers.get("ETag"), res.headers.get("Last-Modified"),
+                                        body_digest, value)
+
+        return value, body_digest
+
+    def has_ticker(self, ticker):
+        return self.tickers is None or ticker in self.tickers
+
+    def get_financial_statement(self, ticker, statement, period="annual"):
+        url = STATEMENT_API_URL.format(
+            statement=statement,
+            ticker=ticker,
+            apikey=self.apikey)
+        if period == "quarter":
+            url += "&period=quarter"
+
+        statement_df, digest = self._get(
+            url, lambda res: _parse_financials(res, ticker, statement, period),
+            (ticker, statement, period))
+
+        # Copied, the parsed statement is kept for the next requests
+        statement_df = statement_df.copy()
+        statement_df.attrs["fingerprint"] = digest
+
+        return statement_df
+
+    def get_beta(self, ticker):
+        url = BETA_API_URL.format(ticker=ticker, apikey=self.apikey)
+
+        return self._get(url, _parse_beta, (ticker, "profile", "annual"))[0]
+
+
+_default_providers = {}
+_default_providers_lock = threading.Lock()
+
+
+def _default_provider(apikey, tickers=None):
+    """Returns the HttpProvider shared by the objects built without a provider,
+    one per API key and tickers, so that their responses are revalidated rather than downloaded again.
+
+    Parameters
+    ----------
+    apikey : str
+        Financial Modeling Prep API Key
+    tickers : list of str, optional
+        tickers served by the provider, by default any ticker
+
+    Returns
+    -------
+    HttpProvider
+    """
+    key = (apikey, None if tickers is None else frozenset(tickers))
+    with _default_providers_lock:
+        if key not in _default_providers:
+            _default_providers[key] = HttpProvider(apikey, tickers=tickers)
+        return _default_providers[key]
+
+
+class BulkFileProvider(StatementProvider):
+    """Provider reading the statements of a whole universe from one CSV or Parquet file.
+
+    The file is read and reshaped once, for all tickers, when the provider is created.
+    It holds one row per ticker, statement and date, with "ticker", "statement" and "date"
+    columns and one column per statement header (e.g. "Revenue", "Total debt").
+    An optional "period" column ("annual" or "quarter") mixes annual and quarterly rows,
+    rows are annual otherwise. Non-numeric values (ex: currency, filing date or link columns)
+    are ignored, as headers missing from the statement.
+
+    Parameters
+    ----------
+    path : str
+        CSV or Parquet (.parquet, .pq) file of statements
+    profile_path : str, optional
+        CSV or Parquet file with "ticker" and "beta" columns. Beta is inf when missing.
+
+    Raises
+    ------
+    ValueError
+        raised when the statements file misses one of the key columns.
+    """
+
+    def __init__(self, path, profile_path=None):
+        statements = self._read(path)
+
+        missing = {"ticker", "statement", "date"} - set(statements.columns)
+        if missing:
+            raise ValueError(
+                "Statements file is missing {} columns.".format(sorted(missing)))
+
+        statements["ticker"] = statements["ticker"].str.upper()
+        if "period" not in statements.columns:
+            statements["period"] = "annual"
+
+        for column in statements.columns.difference(["ticker", "statement", "date", "period"]):
+            if not pd.api.types.is_numeric_dtype(statements[column]):
+                statements[column] = pd.to_numeric(statements[column], errors="coerce")
+
+        self._statements = {}
+        for period, rows in statements.groupby("period"):
+            stacked = _stack_statements(rows.drop(columns="period"), period)
+            for (ticker, statement), group in stacked.groupby(["ticker", "statement"]):
+                self._statements[(ticker, statement, period)] = group.reset_index(drop=True)
+        self._tickers = set(statements["ticker"])
+
+        self._betas = {}
+        if profile_path is not None:
+            profile = self._read(profile_path)
+            betas = pd.to_numeric(profile["beta"], errors="coerce")
+            self._betas = dict(zip(profile["ticker"].str.upper(), betas))
+
+    @staticmethod
+    def _read(path):
+        if os.path.splitext(path)[1].lower() in (".parquet", ".pq"):
+            return pd.read_parquet(path)
+        return pd.read_csv(path, dtype={"ticker": str})
+
+    def has_ticker(self, ticker):
+        return ticker in self._tickers
+
+    def get_financial_statement(self, ticker, statement, period="annual"):
+        if (ticker, statement, period) not in self._statements:
+            return pd.DataFrame(
+                [], columns=['ticker', 'statement', 'header', 'year', 'amount']).astype(
+                    {'year': np.int64, 'amount': np.float32})
+        return self._statements[(ticker, statement, period)].copy()
+
+    def get_beta(self, ticker):
+        beta = self._betas.get(ticker)
+        if beta is None or np.isnan(beta):
+            return float("inf")
+        return float(beta)
@@ -0,0 +1,302 @@
+"""Long-running scoring service.
+
+The universe is loaded once, statements and scores are kept in memory and served over HTTP:
+
+    GET /scores/<ticker>                     all scores of a ticker
+    GET /scores/<ticker>/<score>?years=10    one score of a ticker
+    GET /top?k=10&score=fscore               k best tickers for a score
+
+Stale tickers are refreshed by a background thread; readers keep being served the previous
+entry until the new one replaces it.
+
+    python -m valinvest.server --universe sp500 --port 8000
+"""
+import json
+import time
+import heapq
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from .fundamentals import Fundamental
+from .providers import _default_provider
+from .main import _source_parser, _tickers, _provider, _cache
+
+SCORES = [
+    "fscore",
+    "revenue_score",
+    "ebitda_score",
+    "eps_score",
+    "roic_score",
+    "croic_score",
+    "debt_cost_score",
+    "eq_buyback_score",
+    "ebitda_cover_score",
+    "beta_score",
+]
+
+
+class _Entry:
+    """Fundamental object of a ticker, with its scores and load time. Never modified once built."""
+
+    def __init__(self, fundamental, years):
+        self.fundamental = fundamental
+        self.loaded = time.time()
+        self.scores = {name: _compute(fundamental, name, years) for name in SCORES}
+
+
+def _compute(fundamental, name, years):
+    if name == "beta_score":
+        return float(fundamental.beta_score())
+    return float(getattr(fundamental, name)(years))
+
+
+class ScoringService:
+    """In-memory universe of Fundamental objects and their scores.
+
+    Parameters
+    ----------
+    ticker_list : list of str
+        tickers of the universe
+    apikey : str, optional
+        Financial Modeling Prep API Key, only required when no provider is given
+    provider : StatementProvider, optional
+        source of the financial statements, by default the HttpProvider of apikey
+    period : str, optional
+        "annual" or "quarter", by default "annual"
+    cache : ScoreCache, optional
+        persistent cache of the scores
+    years : int, optional
+        timeframe of the precomputed scores, by default 10 years
+    max_age : float, optional
+        age in seconds after which a ticker is refreshed, or a failed ticker retried,
+        by default one day
+    workers : int, optional
+        number of threads loading tickers, by default 8
+    """
+
+    def __init__(self, ticker_list, apikey=None, provider=None, period="annual", cache=None,
+                 years=10, max_age=24 * 3600, workers=8):
+        if provider is None:
+            provider = _default_provider(apikey)
+
+        self.ticker_list = [ticker.upper() for ticker in ticker_list]
+        self.provider = provider
+        self.period = period
+        self.cache = cache
+        self.years = years
+        self.max_age = max_age
+        self.workers = workers
+        # ticker -> (failure time, error message) of the tickers that could not be loaded
+        self.errors = {}
+
+        # Entries are replaced, never mutated, so readers do not need a lock.
+        self._entries = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self, ticker):
+        """(Re)load statements and scores of a ticker.
+
+        Returns
+        -------
+        bool
+            True if the ticker could be loaded.
+        """
+        try:
+            fundamental = Fundamental(ticker, provider=self.provider,
+                                      period=self.period, cache=self.cache)
+            entry = _Entry(fundamental, self.years)
+        except Exception as e:
+            self.errors[ticker] = (time.time(), str(e))
+            return False
+
+        self._entries[ticker] = entry
+        self.errors.pop(ticker, None)
+        return True
+
+    def load(self, ticker_list=None):
+        """Load tickers, by default the whole universe, in parallel.
+
+        Returns
+        -------
+        int
+            Number of tickers loaded.
+        """
+        if ticker_list is None:
+            ticker_list = self.ticker_list
+        with ThreadPoolExecutor(self.workers) as executor:
+            return sum(executor.map(self.refresh, ticker_list))
+
+    def stale(self):
+        """Returns the tickers loaded or failed more than max_age ago, or never tried yet.
+        Failed tickers (ex: delisted) are not retried on every refresh."""
+        now = time.time()
+        entries = dict(self._entries)
+        errors = dict(self.errors)
+
+        def last_try(ticker):
+            if ticker in entries:
+                return entries[ticker].loaded
+            if ticker in errors:
+                return errors[ticker][0]
+            return None
+
+        res = []
+        for ticker in self.ticker_list:
+            tried = last_try(ticker)
+            if tried is None or now - tried > self.max_age:
+                res.append(ticker)
+        return res
+
+    def start(self, interval=60):
+        """Start the background thread refreshing stale tickers every `interval` seconds."""
+        def run():
+            while not self._stop.wait(interval):
+                self.load(self.stale())
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name="valinvest-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background refresh thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def scores(self, ticker):
+        """Returns all scores of a ticker.
+
+        Raises
+        ------
+        KeyError
+            Raised if the ticker is not loaded.
+        """
+        return dict(self._entries[ticker.upper()].scores)
+
+    def score(self, ticker, name="fscore", years=None):
+        """Returns one score of a ticker. Scores on another timeframe than `years` are computed
+        from the in-memory statements.
+
+        Raises
+        ------
+        KeyError
+            Raised if the ticker is not loaded.
+        ValueError
+            Raised if the score is unknown.
+        """
+        if name not in SCORES:
+            raise ValueError("Unknown score {}".format(name))
+
+        entry = self._entries[ticker.upper()]
+        if years is None or years == self.years:
+            return entry.scores[name]
+        return _compute(entry.fundamental, name, years)
+
+    def top(self, k=10, name="fscore"):
+        """Returns the k best loaded tickers for a score, as (ticker, score) pairs.
+
+        Raises
+        ------
+        ValueError
+            Raised if the score is unknown.
+        """
+        if name not in SCORES:
+            raise ValueError("Unknown score {}".format(name))
+
+        entries = list(self._entries.items())
+        return heapq.nlargest(k, ((ticker, entry.scores[name]) for ticker, entry in entries),
+                              key=lambda item: item[1])
+
+
+def make_server(service, host="127.0.0.1", port=8000):
+    """Returns an HTTP server answering queries from a ScoringService.
+
+    Parameters
+    ----------
+    service : ScoringService
+        loaded service
+    host : str, optional
+        by default "127.0.0.1"
+    port : int, optional
+        by default 8000, 0 for any free port
+
+    Returns
+    -------
+    http.server.ThreadingHTTPServer
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [part for part in url.path.split("/") if part]
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+            try:
+                if len(parts) == 2 and parts[0] == "scores":
+                    body = {"ticker": parts[1].upper(), "scores": service.scores(parts[1])}
+                elif len(parts) == 3 and parts[0] == "scores":
+                    years = int(query["years"]) if "years" in query else None
+                    body = {"ticker": parts[1].upper(), "score": parts[2],
+                            "value": service.score(parts[1], parts[2], years)}
+                elif parts == ["top"]:
+                    name = query.get("score", "fscore")
+                    body = {"score": name,
+                            "top": [{"ticker": ticker, "value": value} for ticker, value
+                                    in service.top(int(query.get("k", 10)), name)]}
+                else:
+                    return self._send(404, {"error": "Unknown path {}".format(url.path)})
+            except KeyError as e:
+                return self._send(404, {"error": "Ticker {} is not loaded".format(e)})
+            except (TypeError, ValueError) as e:
+                return self._send(400, {"error": str(e)})
+
+            self._send(200, body)
+
+        def _send(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m valinvest.server",
+                                     description="F-Score HTTP service.",
+                                     parents=[_source_parser()])
+    parser.add_argument("--period", choices=["annual", "quarter"], default="annual")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-age", type=float, default=24 * 3600,
+                        help="seconds after which a ticker is refreshed")
+    args = parser.parse_args(argv)
+
+    service = ScoringService(_tickers(args), provider=_provider(args), period=args.period,
+                             cache=_cache(args), max_age=args.max_age)
+    print("Loaded {} tickers".format(service.load()))
+    service.start()
+
+    server = make_server(service, args.host, args.port)
+    print("Serving on http://{}:{}".format(*server.server_address[:2]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
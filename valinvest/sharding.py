@@ -0,0 +1,275 @@
+"""Sharded scoring of large ticker universes.
+
+The ticker list is split into N shards by a deterministic hash, each shard is scored by a worker
+writing a partial CSV file, and the partial files are merged into one ranked table.
+Workers share nothing, so they can run on any number of machines; `run_local` stands in for the
+cluster scheduler by running the workers as local processes.
+
+    python -m valinvest.sharding worker --shard 0 --shards 8 --universe sp500 --output part-0.csv
+    python -m valinvest.sharding merge --output scores.csv part-*.csv
+    python -m valinvest.sharding run --shards 8 --processes 4 --universe sp500 --output-dir scores
+"""
+import os
+import sys
+import time
+import hashlib
+import argparse
+import subprocess
+import pandas as pd
+from .main import get_tickers_scores, _source_parser, _read_tickers, _tickers, _provider, _cache
+
+PARTIAL_COLUMNS = ["ticker", "fscore", "error"]
+
+
+def ticker_shard(ticker, shards):
+    """Returns the shard of a ticker. Stable across processes, machines and Python versions.
+
+    Parameters
+    ----------
+    ticker : str
+        symbol of the company
+    shards : int
+        number of shards
+
+    Returns
+    -------
+    int
+        Shard number in [0, shards[.
+    """
+    digest = hashlib.md5(ticker.upper().encode()).hexdigest()
+    return int(digest, 16) % shards
+
+
+def partition_tickers(ticker_list, shards):
+    """Split a ticker list into shards.
+
+    Parameters
+    ----------
+    ticker_list : list of str
+        tickers to score
+    shards : int
+        number of shards
+
+    Returns
+    -------
+    list
+        One list of tickers per shard, in ticker_list order.
+
+    Raises
+    ------
+    ValueError
+        Raised if shards is not a positive integer.
+    """
+    if not isinstance(shards, int) or shards <= 0:
+        raise ValueError("'shards' should be a positive integer")
+
+    res = [[] for _ in range(shards)]
+    for ticker in dict.fromkeys(ticker.upper() for ticker in ticker_list):
+        res[ticker_shard(ticker, shards)].append(ticker)
+    return res
+
+
+def score_shard(ticker_list, shard, shards, output, apikey=None, provider=None, cache=None):
+    """Score the tickers of one shard and write them to a partial CSV file (ticker, fscore, error).
+    Tickers that could not be scored are written with an empty fscore and their error message.
+
+    Parameters
+    ----------
+    ticker_list : list of str
+        whole ticker universe, the same for all shards
+    shard : int
+        shard to score, in [0, shards[
+    shards : int
+        number of shards
+    output : str
+        partial CSV file
+    apikey : str, optional
+        Financial Modeling Prep API Key, only required when no provider is given
+    provider : StatementProvider, optional
+        source of the financial statements, by default an HttpProvider
+    cache : ScoreCache, optional
+        persistent cache of the scores
+
+    Returns
+    -------
+    pandas.DataFrame
+        Scores of the shard, and errors of the failed tickers.
+    """
+    if not 0 <= shard < shards:
+        raise ValueError("'shard' should be between 0 and {}".format(shards - 1))
+
+    tickers = partition_tickers(ticker_list, shards)[shard]
+    errors = {}
+    scored = get_tickers_scores(tickers, apikey, provider, cache, errors)
+    scores = pd.DataFrame([[ticker, score, None] for ticker, score in scored] +
+                          [[ticker, None, error] for ticker, error in errors.items()],
+                          columns=PARTIAL_COLUMNS).astype({"fscore": float})
+
+    # Written aside then renamed, so a partial file is either complete or missing.
+    tmp_output = "{}.{}.tmp".format(output, os.getpid())
+    scores.to_csv(tmp_output, index=False)
+    os.replace(tmp_output, output)
+
+    return scores
+
+
+def merge_shards(paths, output=None, ticker_list=None):
+    """Merge partial CSV files into one table ranked by F-Score.
+    Failed tickers, and tickers of ticker_list missing from every partial file,
+    are listed after the scored ones with an empty rank and fscore, and their error.
+
+    Parameters
+    ----------
+    paths : list of str
+        partial CSV files written by score_shard
+    output : str, optional
+        CSV file of the merged table
+    ticker_list : list of str, optional
+        whole ticker universe, to report the tickers missing from the partial files
+
+    Returns
+    -------
+    pandas.DataFrame
+        rank, ticker, fscore and error columns, best scores first.
+    """
+    scores = pd.concat([pd.read_csv(path, dtype={"ticker": str, "error": str}) for path in paths],
+                       ignore_index=True).reindex(columns=PARTIAL_COLUMNS)
+
+    if ticker_list is not None:
+        known = set(scores["ticker"])
+        missing = [[ticker, None, "missing from the partial files"]
+                   for ticker in dict.fromkeys(ticker.upper() for ticker in ticker_list)
+                   if ticker not in known]
+        if missing:
+            scores = pd.concat([scores, pd.DataFrame(missing, columns=PARTIAL_COLUMNS).astype(
+                {"fscore": float})], ignore_index=True)
+
+    scores = (scores.drop_duplicates("ticker", keep="last")
+                    .sort_values(["fscore", "ticker"], ascending=[False, True], na_position="last")
+                    .reset_index(drop=True))
+    scores.insert(0, "rank", scores["fscore"].rank(method="min", ascending=False).astype("Int64"))
+
+    if output is not None:
+        scores.to_csv(output, index=False)
+
+    return scores
+
+
+def run_local(ticker_list, shards, output_dir, processes=None, worker_args=()):
+    """Local coordinator: run one worker process per shard, at most `processes` at a time,
+    then merge their partial files into output_dir/scores.csv.
+
+    Parameters
+    ----------
+    ticker_list : list of str
+        tickers to score
+    shards : int
+        number of shards
+    output_dir : str
+        directory of the partial and merged files
+    processes : int, optional
+        maximum number of concurrent workers, by default the number of CPUs
+    worker_args : list of str, optional
+        data source options given to every worker, ex: ["--bulk-file", "statements.parquet"]
+
+    Returns
+    -------
+    pandas.DataFrame
+        Merged scores.
+
+    Raises
+    ------
+    RuntimeError
+        Raised if a worker fails, once the other workers are terminated.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    processes = processes or os.cpu_count() or 1
+
+    tickers_file = os.path.join(output_dir, "tickers.txt")
+    with open(tickers_file, "w") as f:
+        f.write("\n".join(ticker_list))
+
+    paths = [os.path.join(output_dir, "part-{}.csv".format(shard)) for shard in range(shards)]
+    pending = [[sys.executable, "-m", "valinvest.sharding", "worker",
+                "--shard", str(shard), "--shards", str(shards),
+                "--tickers-file", tickers_file, "--output", path] + list(worker_args)
+               for shard, path in enumerate(paths)]
+    running = []
+    try:
+        while pending or running:
+            # A new worker is started as soon as any worker exits
+            while pending and len(running) < processes:
+                running.append(subprocess.Popen(pending.pop(0)))
+            finished = [process for process in running if process.poll() is not None]
+            if not finished:
+                time.sleep(0.05)
+            for process in finished:
+                running.remove(process)
+                if process.returncode != 0:
+                    raise RuntimeError("Worker {} failed with code {}".format(
+                        " ".join(process.args), process.returncode))
+    finally:
+        # Remaining workers are stopped when one fails or the coordinator is interrupted
+        for process in running:
+            process.terminate()
+        for process in running:
+            process.wait()
+
+    return merge_shards(paths, os.path.join(output_dir, "scores.csv"), ticker_list)
+
+
+def _worker_args(args):
+    res = []
+    for option in ["bulk_file", "profile_file", "cache"]:
+        if getattr(args, option):
+            res += ["--" + option.replace("_", "-"), getattr(args, option)]
+    return res
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m valinvest.sharding",
+                                     description="Sharded F-Score computation.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    source = _source_parser()
+
+    worker = commands.add_parser("worker", parents=[source], help="score one shard")
+    worker.add_argument("--shard", type=int, required=True)
+    worker.add_argument("--shards", type=int, required=True)
+    worker.add_argument("--output", required=True)
+
+    merge = commands.add_parser("merge", help="merge partial files")
+    merge.add_argument("--output", required=True)
+    merge.add_argument("--tickers-file", help="whole universe, to report the missing tickers")
+    merge.add_argument("paths", nargs="+")
+
+    run = commands.add_parser("run", parents=[source], help="run all shards locally and merge")
+    run.add_argument("--shards", type=int, required=True)
+    run.add_argument("--processes", type=int)
+    run.add_argument("--output-dir", required=True)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "worker":
+        score_shard(_tickers(args), args.shard, args.shards, args.output,
+                    provider=_provider(args), cache=_cache(args))
+        return
+
+    if args.command == "merge":
+        ticker_list = _read_tickers(args.tickers_file) if args.tickers_file else None
+        scores = merge_shards(args.paths, args.output, ticker_list)
+    else:
+        # Given to the workers through their environment rather than their command line
+        if args.apikey:
+            os.environ["VALINVEST_APIKEY"] = args.apikey
+        scores = run_local(_tickers(args), args.shards, args.output_dir, args.processes,
+                           _worker_args(args))
+
+    failed = scores[scores["fscore"].isna()]
+    print("{} tickers scored, {} failed or missing".format(len(scores) - len(failed), len(failed)))
+    for ticker, error in zip(failed["ticker"], failed["error"]):
+        print(ticker, error)
+
+
+if __name__ == "__main__":
+    main()
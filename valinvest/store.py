@@ -0,0 +1,247 @@
+import os
+import io
+import json
+import hashlib
+import threading
+import pandas as pd
+from .cache import CACHE_DIR
+from .providers import StatementProvider, _parse_financials, _parse_beta
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within the process
+    fcntl = None
+
+# Pseudo statement of the profile payloads (beta)
+PROFILE = "profile"
+
+INDEX_COLUMNS = ["ticker", "statement", "period", "retrieved", "digest", "offset", "length"]
+
+
+class StatementStore:
+    """Append-only local store of statement payloads, versioned by retrieval date.
+
+    Payloads are appended to payloads.jsonl, and one row per version to index.csv.
+    A payload identical to the version of its ticker, statement and period known on its retrieval date
+    is not stored again. Older snapshots can be backfilled: the version known on a date is the one
+    with the latest retrieval date, not the last one appended.
+    Versions are never modified, so the statements known on any past date can be rebuilt.
+
+    Parameters
+    ----------
+    root : str, optional
+        store directory, by default "store" in $VALINVEST_CACHE_DIR (~/.cache/valinvest)
+    """
+
+    def __init__(self, root=None):
+        if root is None:
+            root = os.path.join(CACHE_DIR, "store")
+        os.makedirs(root, exist_ok=True)
+
+        self.root = root
+        self.payloads_path = os.path.join(root, "payloads.jsonl")
+        self.index_path = os.path.join(root, "index.csv")
+        self._lock = threading.Lock()
+        # (retrieved, digest) versions by (ticker, statement, period) in append order,
+        # up to _index_size bytes of the index
+        self._versions = {}
+        self._index_size = 0
+
+    def append(self, ticker, statement, payload, period="annual", retrieved=None):
+        """Store a new version of a payload.
+
+        Parameters
+        ----------
+        ticker : str
+            symbol of the company
+        statement : str
+            "balance-sheet-statement", "cash-flow-statement", "income-statement" or "profile"
+        payload : dict
+            decoded JSON payload of the Financial Modeling Prep API
+        period : str, optional
+            "annual" or "quarter", by default "annual"
+        retrieved : str or datetime, optional
+            retrieval date, by default today
+
+        Returns
+        -------
+        bool
+            True if the payload was stored, False if it is the same as the version known on
+            the retrieval date.
+        """
+        line = (json.dumps(payload, sort_keys=True) + "\n").encode()
+        digest = hashlib.sha256(line).hexdigest()
+        retrieved = pd.Timestamp(retrieved if retrieved is not None else "today").strftime("%Y-%m-%d")
+        key = (ticker.upper(), statement, period)
+
+        with self._lock, open(self.payloads_path, "ab") as payloads:
+            if fcntl is not None:
+                fcntl.flock(payloads, fcntl.LOCK_EX)
+
+            # Other instances or processes may have appended since the last call
+            self._read_versions()
+            if self._known_digest(key, retrieved) == digest:
+                return False
+
+            payloads.seek(0, io.SEEK_END)
+            offset = payloads.tell()
+            payloads.write(line)
+            payloads.flush()
+
+            new_index = not os.path.exists(self.index_path)
+            with open(self.index_path, "a") as index:
+                if new_index:
+                    index.write(",".join(INDEX_COLUMNS) + "\n")
+                index.write(",".join([key[0], statement, period, retrieved, digest,
+                                      str(offset), str(len(line))]) + "\n")
+
+            return True
+
+    def _read_versions(self):
+        """Reads the index rows appended since the last call into the versions.
+        Called under the payloads file lock, so rows are complete."""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "rb") as index:
+            index.seek(self._index_size)
+            rows = index.read().decode().splitlines()
+            if self._index_size == 0:
+                rows = rows[1:]
+            self._index_size = index.tell()
+
+        for row in rows:
+            ticker, statement, period, retrieved, digest = row.split(",")[:5]
+            self._versions.setdefault((ticker, statement, period), []).append((retrieved, digest))
+
+    def _known_digest(self, key, date):
+        """Returns the digest of the version known on a date, None if there is none."""
+        res = None
+        known = None
+        for retrieved, digest in self._versions.get(key, []):
+            # Latest retrieval date first, then last appended
+            if retrieved <= date and (known is None or retrieved >= known):
+                known, res = retrieved, digest
+        return res
+
+    def index(self):
+        """Returns the index of all stored versions, in append order.
+
+        Returns
+        -------
+        pandas.DataFrame
+            ticker, statement, period, retrieved, digest, offset and length columns.
+        """
+        if not os.path.exists(self.index_path):
+            return pd.DataFrame([], columns=INDEX_COLUMNS)
+        index = pd.read_csv(self.index_path, dtype={"ticker": str})
+        index["retrieved"] = pd.to_datetime(index["retrieved"])
+        return index
+
+    def as_of(self, date, tickers=None, period="annual"):
+        """Returns the latest version of each ticker and statement retrieved on or before a date,
+        for the whole universe (or some tickers) in one vectorized lookup.
+
+        Parameters
+        ----------
+        date : str or datetime
+            as-of date
+        tickers : list of str, optional
+            tickers to look up, by default all stored tickers
+        period : str, optional
+            "annual" or "quarter", by default "annual"
+
+        Returns
+        -------
+        pandas.DataFrame
+            Index rows of the versions known on that date, one per ticker and statement.
+        """
+        index = self.index()
+        known = (index["retrieved"] <= pd.Timestamp(date)) & (index["period"] == period)
+        if tickers is not None:
+            known &= index["ticker"].isin([ticker.upper() for ticker in tickers])
+
+        # Latest retrieval date, then last appended row (stable sort of rows in append order)
+        return (index[known]
+                .sort_values("retrieved", kind="stable")
+                .drop_duplicates(["ticker", "statement"], keep="last")
+                .reset_index(drop=True))
+
+    def read(self, offset, length):
+        """Returns the payload stored at an index offset."""
+        with open(self.payloads_path, "rb") as payloads:
+            payloads.seek(offset)
+            return json.loads(payloads.read(length))
+
+    def snapshot(self, date, tickers=None, period="annual"):
+        """Returns the payloads known on a date.
+
+        Parameters
+        ----------
+        date : str or datetime
+            as-of date
+        tickers : list of str, optional
+            tickers to look up, by default all stored tickers
+        period : str, optional
+            "annual" or "quarter", by default "annual"
+
+        Returns
+        -------
+        dict
+            payload by (ticker, statement).
+        """
+        versions = self.as_of(date, tickers, period).sort_values("offset")
+        with open(self.payloads_path, "rb") as payloads:
+            res = {}
+            for ticker, statement, offset, length in zip(versions["ticker"], versions["statement"],
+                                                         versions["offset"], versions["length"]):
+                payloads.seek(offset)
+                res[(ticker, statement)] = json.loads(payloads.read(length))
+        return res
+
+
+class PointInTimeProvider(StatementProvider):
+    """Provider serving the statements known on a past date from a StatementStore, without network.
+
+    Parameters
+    ----------
+    store : StatementStore
+        store of the payloads
+    date : str or datetime
+        as-of date
+    tickers : list of str, optional
+        tickers to serve, by default all stored tickers
+    """
+
+    def __init__(self, store, date, tickers=None):
+        self.store = store
+        self.date = pd.Timestamp(date)
+        self.tickers = tickers
+        self._versions = {}
+
+    def _version(self, ticker, statement, period):
+        if period not in self._versions:
+            versions = self.store.as_of(self.date, self.tickers, period)
+            self._versions[period] = {
+                (ticker, statement): (offset, length)
+                for ticker, statement, offset, length in zip(
+                    versions["ticker"], versions["statement"], versions["offset"], versions["length"])
+            }
+        return self._versions[period].get((ticker, statement))
+
+    def has_ticker(self, ticker):
+        return self._version(ticker, PROFILE, "annual") is not None or any(
+            self._version(ticker, statement, "annual") is not None
+            for statement in ["income-statement", "balance-sheet-statement", "cash-flow-statement"])
+
+    def get_financial_statement(self, ticker, statement, period="annual"):
+        version = self._version(ticker, statement, period)
+        if version is None:
+            raise ValueError("No {} {} statement of {} known on {}".format(
+                period, statement, ticker, self.date.date()))
+        return _parse_financials(self.store.read(*version), ticker, statement, period)
+
+    def get_beta(self, ticker):
+        version = self._version(ticker, PROFILE, "annual")
+        if version is None:
+            return float("inf")
+        return _parse_beta(self.store.read(*version))
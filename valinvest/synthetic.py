@@ -0,0 +1,351 @@
+"""Synthetic universes for scale and load testing.
+
+SyntheticProvider generates deterministic Financial Modeling Prep shaped payloads (header names,
+string amounts, missing headers and '' blanks) for any number of tickers and years, and serves
+them through the same parsing path as the API. `scaling_report` measures throughput, peak memory
+and speed-up of universe scoring as tickers, years and processes grow.
+
+    python -m valinvest.synthetic --tickers 1000 10000 --years 10 30 --processes 1 2 4
+"""
+import os
+import sys
+import time
+import zlib
+import argparse
+import tempfile
+from multiprocessing import Pool
+import numpy as np
+import pandas as pd
+from .fundamentals import Fundamental
+from .providers import (StatementProvider, BulkFileProvider, _parse_financials, _parse_beta,
+                        INCOME_STATEMENT, BALANCE_STATEMENT, CASH_FLOW_STATEMENT)
+
+# Headers of the Financial Modeling Prep statements, with the headers used by the scores first
+INCOME_HEADERS = [
+    "Revenue", "EBITDA", "EPS Diluted", "Operating Income", "Operating Expenses", "Interest Expense",
+    "Earnings before Tax", "Income Tax Expense", "Net Income", "Weighted Average Shs Out (Dil)",
+    "Revenue Growth", "Cost of Revenue", "Gross Profit", "R&D Expenses", "SG&A Expense",
+    "Net Income - Non-Controlling int", "Net Income - Discontinued ops", "Preferred Dividends",
+    "Net Income Com", "EPS", "Weighted Average Shs Out", "Dividend per Share", "Gross Margin",
+    "EBITDA Margin", "EBIT Margin", "Profit Margin", "Free Cash Flow margin", "EBIT",
+    "Consolidated Income", "Earnings Before Tax Margin", "Net Profit Margin",
+]
+BALANCE_HEADERS = [
+    "Total debt", "Total shareholders equity", "Cash and cash equivalents", "Short-term investments",
+    "Cash and short-term investments", "Receivables", "Inventories", "Total current assets",
+    "Property, Plant & Equipment Net", "Goodwill and Intangible Assets", "Long-term investments",
+    "Tax assets", "Total non-current assets", "Total assets", "Payables", "Short-term debt",
+    "Total current liabilities", "Long-term debt", "Deferred revenue", "Tax Liabilities",
+    "Deposit Liabilities", "Total non-current liabilities", "Total liabilities",
+    "Other comprehensive income", "Retained earnings (deficit)", "Investments", "Net Debt",
+    "Other Assets", "Other Liabilities",
+]
+CASH_FLOW_HEADERS = [
+    "Free Cash Flow", "Depreciation & Amortization", "Stock-based compensation", "Operating Cash Flow",
+    "Capital Expenditure", "Acquisitions and disposals", "Investment purchases and sales",
+    "Investing Cash flow", "Issuance (repayment) of debt", "Issuance (buybacks) of shares",
+    "Dividend payments", "Financing Cash Flow", "Effect of forex changes on cash",
+    "Net cash flow / Change in cash", "Net Cash/Marketcap",
+]
+HEADERS = {
+    INCOME_STATEMENT: INCOME_HEADERS,
+    BALANCE_STATEMENT: BALANCE_HEADERS,
+    CASH_FLOW_STATEMENT: CASH_FLOW_HEADERS,
+}
+
+
+class SyntheticProvider(StatementProvider):
+    """Deterministic synthetic universe, served as Financial Modeling Prep payloads.
+
+    Tickers are named SYN000000, SYN000001, ... Each ticker has its own random revenue path and
+    ratios, drawn from a generator seeded by `seed` and the ticker, so a payload is the same
+    in every process and run.
+
+    Parameters
+    ----------
+    n_tickers : int, optional
+        number of tickers, by default 1000
+    years : int, optional
+        years of history, by default 30
+    end_year : int, optional
+        last reported year, by default 2019
+    seed : int, optional
+        by default 0
+    missing_rate : float, optional
+        probability for a header to be missing from a yearly record, by default 0.02
+    blank_rate : float, optional
+        probability for an amount to be reported as '', by default 0.02
+    """
+
+    def __init__(self, n_tickers=1000, years=30, end_year=2019, seed=0,
+                 missing_rate=0.02, blank_rate=0.02):
+        self.n_tickers = n_tickers
+        self.years = years
+        self.end_year = end_year
+        self.seed = seed
+        self.missing_rate = missing_rate
+        self.blank_rate = blank_rate
+
+    @property
+    def tickers(self):
+        """Returns the tickers of the universe."""
+        return ["SYN{:06d}".format(i) for i in range(self.n_tickers)]
+
+    def has_ticker(self, ticker):
+        return (len(ticker) == 9 and ticker.startswith("SYN") and ticker[3:].isdigit()
+                and int(ticker[3:]) < self.n_tickers)
+
+    def _rng(self, ticker, *salt):
+        return np.random.default_rng([self.seed, zlib.crc32(ticker.encode())] + list(salt))
+
+    def _amounts(self, ticker, periods_per_year):
+        """Returns every header amount of a ticker, one row per period, oldest first."""
+        rng = self._rng(ticker)
+        n = self.years * periods_per_year
+
+        # Company profile
+        size = rng.lognormal(8, 1.5)
+        growth = rng.normal(0.06, 0.05) / periods_per_year
+        ebitda_margin = rng.uniform(0.05, 0.4)
+        leverage = rng.uniform(0, 1.5)
+        rate = rng.uniform(0.01, 0.08)
+        tax_rate = rng.uniform(0.1, 0.3)
+        buyback = rng.normal(-0.01, 0.02) / periods_per_year
+
+        revenue = size * np.exp(np.cumsum(rng.normal(growth, 0.08 / np.sqrt(periods_per_year), n)))
+        revenue /= periods_per_year
+        ebitda = revenue * np.clip(ebitda_margin + rng.normal(0, 0.03, n), -0.2, 0.6)
+        operating_expenses = revenue * rng.uniform(0.1, 0.3)
+        operating_income = ebitda - revenue * rng.uniform(0.02, 0.08)
+        equity = size * rng.uniform(0.3, 1.5) * np.exp(np.cumsum(rng.normal(0.02, 0.05, n)))
+        total_debt = equity * leverage * np.exp(rng.normal(0, 0.1, n))
+        interest_expense = total_debt * rate / periods_per_year
+        earnings_before_tax = operating_income - interest_expense
+        income_tax_expense = np.maximum(earnings_before_tax, 0) * tax_rate
+        net_income = earnings_before_tax - income_tax_expense
+        shares = rng.lognormal(5, 1) * np.exp(np.cumsum(rng.normal(buyback, 0.01, n)))
+        free_cash_flow = ebitda * rng.uniform(0.3, 0.9) + rng.normal(0, 0.05, n) * revenue
+
+        amounts = {
+            "Revenue": revenue,
+            "EBITDA": ebitda,
+            "EPS Diluted": net_income / shares,
+            "Operating Income": operating_income,
+            "Operating Expenses": operating_expenses,
+            "Interest Expense": interest_expense,
+            "Earnings before Tax": earnings_before_tax,
+            "Income Tax Expense": income_tax_expense,
+            "Net Income": net_income,
+            "Weighted Average Shs Out (Dil)": shares,
+            "Total debt": total_debt,
+            "Total shareholders equity": equity,
+            "Free Cash Flow": free_cash_flow,
+        }
+
+        # Other headers: noisy ratios of revenue
+        for headers in HEADERS.values():
+            for header in headers:
+                if header not in amounts:
+                    amounts[header] = revenue * rng.uniform(-0.5, 1.5) * rng.lognormal(0, 0.1, n)
+
+        return amounts
+
+    def _dates(self, periods_per_year):
+        if periods_per_year == 4:
+            return pd.date_range(end="{}-12-31".format(self.end_year),
+                                 periods=self.years * 4, freq="QE").strftime("%Y-%m-%d")
+        return ["{}-12-31".format(year)
+                for year in range(self.end_year - self.years + 1, self.end_year + 1)]
+
+    def statement_payload(self, ticker, statement, period="annual"):
+        """Returns a statement payload, as returned by the Financial Modeling Prep API.
+
+        Parameters
+        ----------
+        ticker : str
+            synthetic ticker
+        statement : str
+            Should be either "balance-sheet-statement", "cash-flow-statement" or "income-statement"
+        period : str, optional
+            "annual" or "quarter", by default "annual"
+
+        Returns
+        -------
+        dict
+            {"financials": [...]}, one record per period, latest first, amounts as strings.
+        """
+        periods_per_year = 4 if period == "quarter" else 1
+        amounts = self._amounts(ticker, periods_per_year)
+        headers = HEADERS[statement]
+        values = np.array([amounts[header] for header in headers]).T
+
+        rng = self._rng(ticker, zlib.crc32(statement.encode()), periods_per_year)
+        missing = rng.random(values.shape) < self.missing_rate
+        blank = rng.random(values.shape) < self.blank_rate
+
+        records = []
+        for date, row, row_missing, row_blank in zip(self._dates(periods_per_year), values,
+                                                     missing, blank):
+            record = {"date": date}
+            for header, value, is_missing, is_blank in zip(headers, row, row_missing, row_blank):
+                if not is_missing:
+                    record[header] = "" if is_blank else "{:.4f}".format(value)
+            records.append(record)
+
+        return {"symbol": ticker, "financials": records[::-1]}
+
+    def profile_payload(self, ticker):
+        """Returns a profile payload, as returned by the Financial Modeling Prep API."""
+        rng = self._rng(ticker, 1)
+        beta = "" if rng.random() < self.blank_rate else "{:.4f}".format(rng.lognormal(0, 0.4))
+        return {"symbol": ticker, "profile": {"beta": beta}}
+
+    def get_financial_statement(self, ticker, statement, period="annual"):
+        return _parse_financials(self.statement_payload(ticker, statement, period),
+                                 ticker, statement, period)
+
+    def get_beta(self, ticker):
+        return _parse_beta(self.profile_payload(ticker))
+
+    def to_bulk_frames(self, period="annual"):
+        """Returns the universe in the BulkFileProvider layout.
+
+        Returns
+        -------
+        tuple
+            statements DataFrame (ticker, statement, date and header columns),
+            profiles DataFrame (ticker and beta columns)
+        """
+        frames = []
+        for ticker in self.tickers:
+            for statement in HEADERS:
+                df = pd.DataFrame(self.statement_payload(ticker, statement, period)["financials"])
+                df.insert(0, "statement", statement)
+                df.insert(0, "ticker", ticker)
+                frames.append(df)
+        statements = pd.concat(frames, ignore_index=True)
+        statements["period"] = period
+
+        profiles = pd.DataFrame([{"ticker": ticker, "beta": self.profile_payload(ticker)["profile"]["beta"]}
+                                 for ticker in self.tickers])
+        return statements, profiles
+
+
+_provider = None
+
+
+def _init_worker(provider_args):
+    global _provider
+    kind, args = provider_args
+    _provider = SyntheticProvider(*args) if kind == "synthetic" else BulkFileProvider(*args)
+
+
+def _peak_memory():
+    """Returns the peak resident memory of the process in bytes, nan if unknown (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _score_chunk(tickers):
+    """Scores tickers with the worker provider. Returns the number of scored tickers, the largest
+    number of densified years and the peak memory of the worker."""
+    densified_years = 0
+    for ticker in tickers:
+        fundamental = Fundamental(ticker, provider=_provider)
+        fundamental.fscore()
+        densified_years = max(densified_years, fundamental.statements["year"].nunique())
+    return len(tickers), densified_years, _peak_memory()
+
+
+def scaling_report(ticker_counts=(100, 1000), year_counts=(10, 30), processes=(1, 2, 4),
+                   bulk=False, seed=0):
+    """Measure universe scoring on synthetic universes of growing size.
+    Statements are parsed over all the years of history, but only the last eleven are densified
+    and scored (ten years of growth): history beyond adds parsing cost only.
+    The densified_years column reports the years actually scored.
+
+    Parameters
+    ----------
+    ticker_counts : list of int, optional
+        universe sizes, by default (100, 1000)
+    year_counts : list of int, optional
+        years of history, by default (10, 30)
+    processes : list of int, optional
+        number of worker processes, by default (1, 2, 4)
+    bulk : bool, optional
+        if True, statements are read from a bulk file (BulkFileProvider, load time included)
+        instead of being generated and parsed per ticker, by default False
+    seed : int, optional
+        by default 0
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per configuration: tickers, years, densified_years, processes, seconds,
+        tickers_per_second, peak_memory_mb (per process), speedup (vs the smallest number
+        of processes) and speedup_per_core.
+    """
+    res = []
+    for n_tickers in ticker_counts:
+        for years in year_counts:
+            synthetic = SyntheticProvider(n_tickers, years, seed=seed)
+            tickers = synthetic.tickers
+
+            with tempfile.TemporaryDirectory() as directory:
+                provider_args = ("synthetic", (n_tickers, years, synthetic.end_year, seed))
+                if bulk:
+                    statements, profiles = synthetic.to_bulk_frames()
+                    paths = (os.path.join(directory, "statements.csv"),
+                             os.path.join(directory, "profiles.csv"))
+                    statements.to_csv(paths[0], index=False)
+                    profiles.to_csv(paths[1], index=False)
+                    provider_args = ("bulk", paths)
+
+                for n_processes in processes:
+                    chunks = [tickers[i::n_processes * 4] for i in range(n_processes * 4)]
+                    start = time.perf_counter()
+                    with Pool(n_processes, _init_worker, (provider_args,)) as pool:
+                        results = pool.map(_score_chunk, chunks)
+                    seconds = time.perf_counter() - start
+
+                    res.append({
+                        "tickers": n_tickers,
+                        "years": years,
+                        "densified_years": max(densified for _, densified, _ in results),
+                        "processes": n_processes,
+                        "seconds": seconds,
+                        "tickers_per_second": sum(count for count, _, _ in results) / seconds,
+                        "peak_memory_mb": max(peak for _, _, peak in results) / 2 ** 20,
+                    })
+
+    report = pd.DataFrame(res)
+    baseline = min(processes)
+    single = (report[report["processes"] == baseline]
+              .set_index(["tickers", "years"])["seconds"]
+              .rename("baseline"))
+    report = report.join(single, on=["tickers", "years"])
+    report["speedup"] = report["baseline"] / report["seconds"]
+    report["speedup_per_core"] = report["speedup"] * baseline / report["processes"]
+    return report.drop(columns="baseline")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m valinvest.synthetic",
+                                     description="Scaling report on synthetic universes.")
+    parser.add_argument("--tickers", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--years", type=int, nargs="+", default=[10, 30])
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--bulk", action="store_true", help="read statements from a bulk file")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    report = scaling_report(args.tickers, args.years, args.processes, args.bulk, args.seed)
+    print(report.to_string(index=False, float_format="{:.2f}".format))
+
+
+if __name__ == "__main__":
+    main()